@@ -0,0 +1,66 @@
+"""Compares Currency.to_python against the previous regex + float round-trip implementation.
+
+Run from the repository root: python benchmarks/bench_currency.py
+"""
+import decimal
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from validation21 import Currency, ValidationException
+
+INPUTS = ['$10.34', '10.3', '$1,000.30', '-$1,000.3', '$+1,000.3', '1,234,567.89', '$0.99', '250', '$-42.5', '+$19.95']
+
+_legacy_currency = re.compile(r'^(?P<sign1>[+-])?\$?(?P<sign2>[+-])?(?P<digits>\d*(?:,\d\d\d)*)(?P<cents>\.\d{1,2})?$', re.I)
+
+
+def legacy_decimal(validator, value):
+    if isinstance(value, (str, unicode)):
+        value = value.replace(',', '')
+    try:
+        if not isinstance(value, float):
+            value = float(value)
+        value = decimal.Decimal(('%%0.%df' % validator.scale) % value)
+    except ValueError:
+        raise ValidationException('Please enter a number - [%s]' % value)
+
+    if validator.min is not None and value < decimal.Decimal(str(validator.min)):
+        raise ValidationException('Value must not be less than %d' % (validator.min,))
+    if validator.max is not None and value > decimal.Decimal(str(validator.max)):
+        raise ValidationException('Value must not be greater than %d' % (validator.max,))
+    return value
+
+
+def legacy_to_python(validator, value):
+    """The Currency._to_python this benchmark is measured against."""
+    match = _legacy_currency.search(unicode(value))
+    if not match:
+        raise ValidationException('Please enter a number - [%s]' % value)
+    d = match.groupdict()
+    if not d['digits'] and not d['cents']:
+        raise ValidationException('Please enter a number - [%s]' % value)
+    sign = d['sign2'] or d['sign1'] or ''
+    return legacy_decimal(validator, '%s%s%s' % (sign, d['digits'].replace(',', ''), d['cents'] or '.00'))
+
+
+def bench(name, func, repeat=5, number=2000):
+    best = min(timeit.repeat(func, repeat=repeat, number=number)) / number
+    rate = len(INPUTS) / best
+    print '%-40s %12.0f values/s' % (name, rate)
+    return rate
+
+
+def main():
+    for validator in [Currency(), Currency(min=-100000, max=100000000)]:
+        label = 'Currency(min=%r, max=%r)' % (validator.min, validator.max)
+        old = bench(label + ' legacy', lambda: [legacy_to_python(validator, v) for v in INPUTS])
+        new = bench(label + ' to_python', lambda: [validator.to_python(v) for v in INPUTS])
+        print '%-40s %11.2fx' % ('speedup', new / old)
+        print
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Compares Decimal.to_python against the previous float round-trip implementation.
+
+Run from the repository root: python benchmarks/bench_decimal.py
+"""
+import decimal
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from validation21 import Decimal, ValidationException
+
+INPUTS = ['10.01', '0', '1,234.56', '99.9', '-42.50', '1000000.00', '3', '0.07', '12,345,678.90', '250.5']
+
+
+def legacy_to_python(validator, value):
+    """The float based Decimal._to_python this benchmark is measured against."""
+    if isinstance(value, (str, unicode)):
+        value = value.replace(',', '')
+    try:
+        if not isinstance(value, float):
+            value = float(value)
+        value = decimal.Decimal(('%%0.%df' % validator.scale) % value)
+    except ValueError:
+        raise ValidationException('Please enter a number - [%s]' % value)
+
+    if validator.min is not None and value < decimal.Decimal(str(validator.min)):
+        raise ValidationException('Value must not be less than %d' % (validator.min,))
+    if validator.max is not None and value > decimal.Decimal(str(validator.max)):
+        raise ValidationException('Value must not be greater than %d' % (validator.max,))
+    return value
+
+
+def bench(name, func, repeat=5, number=2000):
+    best = min(timeit.repeat(func, repeat=repeat, number=number)) / number
+    rate = len(INPUTS) / best
+    print '%-40s %12.0f values/s' % (name, rate)
+    return rate
+
+
+def main():
+    for validator in [Decimal(), Decimal(min=-1000, max=100000000)]:
+        label = '%s(min=%r, max=%r)' % (type(validator).__name__, validator.min, validator.max)
+        old = bench(label + ' legacy', lambda: [legacy_to_python(validator, v) for v in INPUTS])
+        new = bench(label + ' to_python', lambda: [validator.to_python(v) for v in INPUTS])
+        many = bench(label + ' to_python_many', lambda: validator.to_python_many(INPUTS))
+        print '%-40s %11.2fx / %.2fx' % ('speedup (single / batch)', new / old, many / old)
+        print
+
+
+if __name__ == '__main__':
+    main()
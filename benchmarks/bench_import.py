@@ -0,0 +1,64 @@
+"""Times `import validation21` in fresh interpreters and lists the heavy modules it pulls in.
+
+Each run starts a new python process so nothing is already imported or cached
+in memory, the reported time is measured inside the child around the import
+statement only (interpreter startup is excluded).
+
+Run from the repository root:
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --runs 50 --max-ms 30
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be loaded by the validators that need them
+HEAVY = ['dateutil', 'enum21', 'inspect', 'hashlib']
+
+CHILD = '''
+import json, sys, timeit
+sys.path.insert(0, %r)
+start = timeit.default_timer()
+import %s
+elapsed = timeit.default_timer() - start
+print json.dumps({'seconds': elapsed, 'heavy': [m for m in %r if sys.modules.get(m) is not None]})
+'''
+
+
+def measure(module, runs):
+    code = CHILD % (ROOT, module, HEAVY)
+    samples = []
+    heavy = set()
+    for _ in xrange(runs):
+        result = json.loads(subprocess.check_output([sys.executable, '-c', code]))
+        samples.append(result['seconds'])
+        heavy.update(result['heavy'])
+    samples.sort()
+    return samples, sorted(heavy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=20, help='number of fresh interpreters to time')
+    parser.add_argument('--module', default='validation21', help='module to import')
+    parser.add_argument('--max-ms', type=float, help='exit with status 1 if the median is slower than this')
+    args = parser.parse_args()
+
+    samples, heavy = measure(args.module, args.runs)
+    median = samples[len(samples) // 2] * 1000
+    print 'import %-24s min %7.2fms   median %7.2fms   max %7.2fms   (%d runs)' % (
+        args.module, samples[0] * 1000, median, samples[-1] * 1000, len(samples))
+    print 'heavy modules loaded: %s' % (', '.join(heavy) or 'none')
+
+    if args.max_ms is not None and median > args.max_ms:
+        print 'SLOWER THAN %.2fms' % args.max_ms
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""Times to_python and from_python for every validator over valid, invalid, empty and adversarial inputs.
+
+Reports ops/sec and per-call latency percentiles, and can save the results as
+JSON so two runs (e.g. before and after an upgrade) can be compared.
+
+Run from the repository root:
+
+    python benchmarks/suite.py --output before.json
+    python benchmarks/suite.py --output after.json --filter Date
+    python benchmarks/suite.py --compare before.json after.json
+"""
+import argparse
+import datetime
+import decimal
+import json
+import os
+import platform
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from validation21 import (Boolean, Currency, Date, DateTime, Decimal, Email, Enum, Integer, ObjectID, Percentage,
+                          PhoneExt, PhoneNumber, Time, Type, Unicode, ValidationException, ZipCode5, ZipCodeExt)
+
+EMPTY = [None, '', '   ', u'', '\t']
+LONG = 'x' * 10000
+
+CORPORA = [
+    ('Integer', Integer(min=0, max=10 ** 9), {
+        'valid': ['0', '42', '1,000', '999999', 17, 123456789, u'55', '7'],
+        'invalid': ['c', '1.5', '-1', '10000000000', 'twelve', '1e3'],
+        'adversarial': ['9' * 5000, ',' * 1000 + '1', LONG],
+    }),
+    ('ObjectID', ObjectID(), {
+        'valid': ['1', '42', 99999, '123,456'],
+        'invalid': ['0', '-5', 'abc'],
+        'adversarial': ['1' * 5000, LONG],
+    }),
+    ('Decimal', Decimal(min=-10 ** 6, max=10 ** 6), {
+        'valid': ['10.01', '0', '1,234.56', '-42.5', 3, 2.5, decimal.Decimal('9.99'), '0.125'],
+        'invalid': ['c', '1.2.3', '2000000', 'nan', '$5'],
+        'adversarial': ['1' * 5000, '0.' + '5' * 5000, LONG],
+    }),
+    ('Currency', Currency(), {
+        'valid': ['$10.34', '10.3', '$1,000.30', '-$1,000.3', '$+1,000.3', '1,234,567.89', 250, decimal.Decimal('1.5')],
+        'invalid': ['c', '$1,00', '10.345', '$$5', '1,0000'],
+        'adversarial': ['$' + '1,000' * 2000, '1' * 5000 + 'x', LONG],
+    }),
+    ('Percentage', Percentage(), {
+        'valid': ['5%', '100', '-100', '12.5 %', 0, '0.01%'],
+        'invalid': ['c%', '%', 'five'],
+        'adversarial': ['5' + ' ' * 5000 + '%', LONG],
+    }),
+    ('Date', Date(), {
+        'valid': ['12/2/1989', '01/02/1989', '1989-01-02', '2016-02-29', datetime.date(2000, 1, 1), 'Jan 5 2000', '1989/01/02'],
+        'invalid': ['01/32/1989', '13/31/1989', '1/1/1800', 'not a date', '2015-02-29'],
+        'adversarial': ['1' * 500, '12/2/1989 ' * 100],
+    }),
+    ('Time', Time(), {
+        'valid': ['13:45', '5:45', '1545', '15:45:45', '12:30AM', datetime.time(5, 45)],
+        'invalid': ['13:60', '24:45', 'noon', '5:45 PM'],
+        'adversarial': ['1' * 5000, LONG],
+    }),
+    ('DateTime', DateTime(), {
+        'valid': ['12/03/1989 5:45:52', '1989-12-03T05:45:52', '1989-12-03 05:45', datetime.datetime(2000, 1, 1), 'Dec 3 1989 5pm'],
+        'invalid': ['12/03/1989 5:45:60', 'yesterday', '1989-13-03'],
+        'adversarial': ['1' * 500, '12/03/1989 ' * 100],
+    }),
+    ('Boolean', Boolean(), {
+        'valid': ['true', 't', 'yes', 'NO', '0', 'off', True, 1, 0, 'None'],
+        'invalid': ['wtf', 'maybe', 'ja'],
+        'adversarial': [' ' * 5000 + 'yes', LONG],
+    }),
+    ('Enum', Enum(['one', 'two', 'three'] + ['code%d' % i for i in range(5000)]), {
+        'valid': ['one', 'two', 'three', 'code42', 'code4999'],
+        'invalid': ['zero', 'ONE', 'code5000'],
+        'adversarial': [LONG],
+    }),
+    ('Type', Type(range(5000)), {
+        'valid': [1, '2', 3, '4,999'],
+        'invalid': [5000, -1, 'x'],
+        'adversarial': ['9' * 5000],
+    }),
+    ('Unicode', Unicode(max_length=255), {
+        'valid': ['hello', u'h\xe9llo', 12345, 'a' * 255],
+        'invalid': ['a' * 256],
+        'adversarial': [LONG, '\xff' * 5000],
+    }),
+    ('PhoneNumber', PhoneNumber(), {
+        'valid': ['2234567890', '223-456-7890', '+1-223-456-7890', '1 (223) 456-7890', 2234567890, '+44 223 456 7890'],
+        'invalid': ['223-456-789o', '112-456-7890', 'call me', '12345'],
+        'adversarial': ['1-' * 2500 + '223-456-7890', '-' * 5000 + '2234567890', '1' * 5000],
+    }),
+    ('Email', Email(), {
+        'valid': ['glen_chiacchieri123@sub1.openmile.com', 'glen.+c@sub.openmile.com', 'a@b.co', 'user@example.com'],
+        'invalid': ['glen@c@sub.openmile.com', 'glen', 'glen ch@openmil.com', '.a@b.com', 'a@b'],
+        'adversarial': ['a' * 5000 + '@example.com', 'a@' + 'b.' * 2500 + 'com', LONG],
+    }),
+    ('ZipCode5', ZipCode5(), {
+        'valid': ['02115', 12115, '123456', '90210-1234'],
+        'invalid': ['1234', 'o2115'],
+        'adversarial': ['1' * 5000, LONG],
+    }),
+    ('ZipCodeExt', ZipCodeExt(), {
+        'valid': ['1234', 1234, '12345'],
+        'invalid': ['123', 'o123'],
+        'adversarial': ['1' * 5000, LONG],
+    }),
+    ('PhoneExt', PhoneExt(), {
+        'valid': ['1234', 1234, '1234567', '1'],
+        'invalid': ['x12', 'ext'],
+        'adversarial': ['1' * 5000, LONG],
+    }),
+]
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def call(func, value):
+    try:
+        func(value)
+    except ValidationException:
+        pass
+    except Exception:
+        # Anything other than a ValidationException is a bug, count it rather than abort the run
+        return 1
+    return 0
+
+
+def bench(func, values, rounds):
+    """Calls func on every value rounds times.
+
+    Throughput comes from timing whole passes over values, latency percentiles
+    from timing each call on its own (limited by the timer's resolution).
+    """
+    timer = timeit.default_timer
+
+    start = timer()
+    for _ in xrange(rounds):
+        for value in values:
+            call(func, value)
+    elapsed = timer() - start
+
+    samples = []
+    append = samples.append
+    crashes = 0
+    for _ in xrange(rounds):
+        for value in values:
+            start = timer()
+            crashes += call(func, value)
+            append(timer() - start)
+    samples.sort()
+
+    return {
+        'calls': len(samples),
+        'crashes': crashes,
+        'ops_per_sec': len(samples) / elapsed if elapsed else 0.0,
+        'p50_us': percentile(samples, 0.50) * 1e6,
+        'p90_us': percentile(samples, 0.90) * 1e6,
+        'p99_us': percentile(samples, 0.99) * 1e6,
+    }
+
+
+def run(rounds, name_filter=None):
+    results = {}
+    for name, validator, corpora in CORPORA:
+        if name_filter and name_filter.lower() not in name.lower():
+            continue
+
+        corpora = dict(corpora, empty=EMPTY)
+        for kind in ('valid', 'invalid', 'empty', 'adversarial'):
+            key = '%s.to_python.%s' % (name, kind)
+            results[key] = bench(validator.to_python, corpora[kind], rounds)
+            report(key, results[key])
+
+        python_values = [v for v in validator.to_python_many(corpora['valid'])[0] if v is not None]
+        key = '%s.from_python.valid' % name
+        results[key] = bench(validator.from_python, python_values, rounds)
+        report(key, results[key])
+    return results
+
+
+def report(key, result):
+    print '%-36s %12.0f ops/s   p50 %8.2fus   p90 %8.2fus   p99 %8.2fus%s' % (
+        key, result['ops_per_sec'], result['p50_us'], result['p90_us'], result['p99_us'],
+        '   %d crashes' % result['crashes'] if result['crashes'] else '')
+
+
+def compare(before_path, after_path, threshold):
+    with open(before_path) as f:
+        before = json.load(f)['results']
+    with open(after_path) as f:
+        after = json.load(f)['results']
+
+    regressions = 0
+    for key in sorted(set(before) & set(after)):
+        ratio = after[key]['ops_per_sec'] / before[key]['ops_per_sec']
+        flag = ''
+        if ratio < 1 - threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print '%-36s %12.0f -> %12.0f ops/s  %6.2fx%s' % (key, before[key]['ops_per_sec'], after[key]['ops_per_sec'], ratio, flag)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rounds', type=int, default=200, help='passes over each corpus')
+    parser.add_argument('--filter', help='only run validators whose name contains this')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two JSON result files')
+    parser.add_argument('--threshold', type=float, default=0.15, help='slowdown fraction reported as a regression')
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(args.compare[0], args.compare[1], args.threshold) else 0)
+
+    results = run(args.rounds, args.filter)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {
+                    'python': platform.python_version(),
+                    'implementation': platform.python_implementation(),
+                    'platform': platform.platform(),
+                    'timestamp': datetime.datetime.utcnow().isoformat(),
+                    'rounds': args.rounds,
+                },
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,16 @@
+import contextlib
 import decimal
 import re
-import inspect
+import sys
+import threading
 
 from datetime import datetime, date, time
-from dateutil.parser import parse
-
-import enum21 as enum
 
 from exception import *
 
+# Digits of precision used when quantizing Decimal input, the default context (28) is too small for large amounts
+_DECIMAL_PRECISION = 1000
+
 
 def split_thousands(s, t_sep=',', d_sep='.'):
     '''Splits a general float on thousands. GIGO on general input'''
@@ -37,17 +39,477 @@ def split_thousands(s, t_sep=',', d_sep='.'):
     else:
         rhs = ''
 
-    splt = ''
-    while s != '':
-        splt = s[-3:] + t_sep + splt
-        s = s[:-3]
+    head = len(s) % 3 or 3
+    splt = t_sep.join([s[:head]] + [s[i:i + 3] for i in xrange(head, len(s), 3)])
+
+    return lhs + splt + rhs
+
+
+class NumberFormat(object):
+    '''Formats numbers with thousands grouping, everything not depending on the value is computed once.
+
+    scale=None formats integers, otherwise values are rounded to scale decimal places.
+
+    >>> NumberFormat().format(1234567)
+    '1,234,567'
+    >>> NumberFormat(scale=2, prefix='$').format(decimal.Decimal('-1234.5'))
+    '$-1,234.50'
+    >>> NumberFormat(scale=2, t_sep='.', d_sep=',').format_many([1234.565, 5])
+    ['1.234,56', '5,00']
+    >>> NumberFormat(scale=2, prefix='$').format_many([decimal.Decimal('NaN'), float('-inf')])
+    ['$NaN', '$-Infinity']
+    '''
+
+    def __init__(self, scale=None, rounding=decimal.ROUND_HALF_EVEN, t_sep=',', d_sep='.', prefix=''):
+        self.scale = scale
+        self.rounding = rounding
+        self.t_sep = t_sep
+        self.d_sep = d_sep
+        self.prefix = prefix
+        if scale is not None:
+            self._quantum = decimal.Decimal(1).scaleb(-scale)
+            self._context = decimal.Context(prec=_DECIMAL_PRECISION, rounding=rounding)
+
+    def _group(self, whole):
+        grouped = format(int(whole), ',')
+        if self.t_sep != ',':
+            grouped = grouped.replace(',', self.t_sep)
+        return grouped
+
+    def format(self, value):
+        if self.scale is None:
+            return self.prefix + self._group(value)
+
+        if isinstance(value, float):
+            value = decimal.Decimal('%f' % value)
+        elif not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(value)
+        if not value.is_finite():
+            # NaN and Infinity have no digits to group or round
+            return self.prefix + str(value)
+
+        # quantize() is by far the most expensive step, skip it when value already has scale places
+        text = str(value)
+        point = text.find('.')
+        places = len(text) - point - 1 if point >= 0 else 0
+        if places != self.scale or 'E' in text:
+            text = str(value.quantize(self._quantum, context=self._context))
+            point = text.find('.')
+
+        sign = ''
+        if text[0] == '-':
+            sign = '-'
+            text = text[1:]
+            point -= 1
+        if point < 0:
+            return self.prefix + sign + self._group(text)
+        return self.prefix + sign + self._group(text[:point]) + self.d_sep + text[point + 1:]
+
+    def format_many(self, values):
+        format = self.format
+        return [format(value) for value in values]
+
+
+def _inherits(validator, base, *names):
+    '''True if validator's class uses base's implementation of every method in names'''
+    cls = type(validator)
+    for name in names:
+        if getattr(cls, name).im_func is not getattr(base, name).im_func:
+            return False
+    return True
+
+
+_native_checks = {}
+
+
+def _native_check(validator):
+    '''True if validator has a non-raising _check it can use.
+
+    The class defining _check lists the methods it replaces in _check_inherits,
+    _check is only usable if validator's class doesn't override any of them.
+    '''
+    cls = type(validator)
+    native = _native_checks.get(cls)
+    if native is None:
+        base = next((c for c in cls.__mro__ if '_check' in c.__dict__), None)
+        native = _native_checks[cls] = base is not None and _inherits(validator, base, *base._check_inherits)
+    return native
 
-    return lhs + splt[:-1] + rhs
+
+class _LazyRegex(object):
+    """A regex compiled the first time it is used, then replaced by the compiled pattern.
+
+    Works as a module global (name is the global's name) or as a class attribute
+    (name is the attribute's name), so only the validators that actually run pay
+    for compiling their patterns.
+
+    >>> class C(object):
+    ...     digits = _LazyRegex('digits', r'\d+')
+    >>> type(C.__dict__['digits']).__name__
+    '_LazyRegex'
+    >>> C().digits.match('42').group()
+    '42'
+    >>> C.__dict__['digits'] is C.digits
+    True
+    """
+    __slots__ = ('name', 'pattern', 'flags')
+
+    def __init__(self, name, pattern, flags=0):
+        self.name = name
+        self.pattern = pattern
+        self.flags = flags
+
+    def __getattr__(self, attr):
+        # Only reached as a module global, class attributes go through __get__
+        compiled = globals()[self.name] = re.compile(self.pattern, self.flags)
+        return getattr(compiled, attr)
+
+    def __get__(self, instance, owner):
+        compiled = re.compile(self.pattern, self.flags)
+        for cls in owner.__mro__:
+            if cls.__dict__.get(self.name) is self:
+                setattr(cls, self.name, compiled)
+                break
+        return compiled
+
+
+def parse(value):
+    '''dateutil.parser.parse, imported on the first call since dateutil is slow to import'''
+    global parse
+    from dateutil.parser import parse
+    return parse(value)
+
+
+_plain_decimal_re = _LazyRegex('_plain_decimal_re', r'^([+-]?)(\d*)(?:\.(\d*))?$')
+
+_iso_datetime_re = _LazyRegex('_iso_datetime_re', r'^(\d{4})-(\d{1,2})-(\d{1,2})(?:[T ](\d{1,2}):(\d\d)(?::(\d\d))?)?$')
+_us_datetime_re = _LazyRegex('_us_datetime_re', r'^(\d{1,2})/(\d{1,2})/(\d{4})(?: (\d{1,2}):(\d\d)(?::(\d\d))?)?$')
+
+
+def _fast_datetime(value):
+    '''Parses YYYY-MM-DD[THH:MM[:SS]] and MM/DD/YYYY[ HH:MM[:SS]] without dateutil.
+
+    Returns None for any other shape or for out of range values, the caller falls
+    back to dateutil which produces the result or error message for those.
+    '''
+    m = _iso_datetime_re.match(value)
+    if m is not None:
+        year, month, day, hour, minute, second = m.groups()
+    else:
+        m = _us_datetime_re.match(value)
+        if m is None:
+            return None
+        month, day, year, hour, minute, second = m.groups()
+
+    try:
+        return datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0))
+    except ValueError:
+        return None
+
+
+def _is_enum_class(choices):
+    # Nothing can subclass enum21.Enum until the caller has imported it, so never import it here
+    enum = sys.modules.get('enum21')
+    return enum is not None and isinstance(choices, type) and issubclass(choices, enum.Enum)
+
+
+_missing = object()
+
+# Binary buffers (e.g. fields sliced out of a receive buffer) accepted wherever str is
+_BUFFER_TYPES = frozenset([bytearray, memoryview, buffer])
+
+
+def _buffer_bytes(value):
+    '''The bytes of a bytearray, memoryview or buffer as a str, nothing is decoded and only the slice itself is copied'''
+    return value.tobytes() if type(value) is memoryview else str(value)
+
+
+def _is_blank(value):
+    '''True for None and for strings or binary buffers holding only whitespace, what Validator.is_empty treats as empty'''
+    if value is None:
+        return True
+    if isinstance(value, basestring):
+        return not value.strip()
+    return type(value) in _BUFFER_TYPES and not _buffer_bytes(value).strip()
+
+
+# Resolver answers cached by ObjectID.batch(), {validator: {id: exists}} per thread
+_reference_batch = threading.local()
+
+
+def _freeze(value):
+    '''Converts lists, dicts and sets into hashable equivalents'''
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    return value
+
+
+_config_names_cache = {}
+
+
+def _config_names(cls):
+    '''The public slots of cls and its bases, the attributes making up a validator's configuration'''
+    names = _config_names_cache.get(cls)
+    if names is None:
+        names = []
+        for c in reversed(cls.__mro__):
+            slots = c.__dict__.get('__slots__', ())
+            if isinstance(slots, basestring):
+                slots = (slots,)
+            names.extend(name for name in slots if not name.startswith('_') and name not in names)
+        names = _config_names_cache[cls] = tuple(names)
+    return names
+
+
+# Shared instances handed out by Validator.intern, by configuration and by constructor arguments.
+# Both are cleared when they reach _INTERN_CACHE_SIZE entries.
+_interned = {}
+_interned_calls = {}
+_intern_lock = threading.Lock()
+_INTERN_CACHE_SIZE = 10000
+
+
+_decimal_parts_cache = {}
+
+
+def _decimal_parts(scale, rounding, prefix):
+    '''(quantum, context, NumberFormat) for a Decimal validator, shared between validators configured alike'''
+    key = (scale, rounding, prefix)
+    parts = _decimal_parts_cache.get(key)
+    if parts is None:
+        parts = _decimal_parts_cache[key] = (decimal.Decimal(1).scaleb(-scale),
+                                             decimal.Context(prec=_DECIMAL_PRECISION, rounding=rounding),
+                                             NumberFormat(scale, rounding, prefix=prefix))
+    return parts
+
+
+class _ValidatorType(type):
+    '''Validators are immutable from the start, their __init__s set their configuration with object.__setattr__.
+
+    Classes defined outside validation21 with their own __init__ (which may assign
+    self.x = ...) get _ThawingType instead, whose instances accept assignments
+    until the outermost __init__ returns.
+    '''
+
+    def __new__(meta, name, bases, namespace):
+        init = namespace.get('__init__')
+        if meta is _ValidatorType and init is not None and getattr(init, '__module__', '').split('.')[0] != __name__:
+            meta = _ThawingType
+        return type.__new__(meta, name, bases, namespace)
+
+
+class _ThawingType(_ValidatorType):
+    def __call__(cls, *args, **kwargs):
+        validator = cls.__new__(cls, *args, **kwargs)
+        if isinstance(validator, cls):
+            object.__setattr__(validator, '_thawed', True)
+            try:
+                validator.__init__(*args, **kwargs)
+            finally:
+                # Configuration is fixed once the outermost __init__ returns
+                object.__delattr__(validator, '_thawed')
+        return validator
+
+
+class _ChoiceIndex(object):
+    '''Hash lookup over the choices of an Enum/Type validator, built on the first lookup.
+
+    choices may be an enum21.Enum class, a sequence of values or a sequence of
+    (value, label) pairs (pair_types selects which sequence types count as pairs).
+    '''
+
+    # Rejecting a value against thousands of choices shouldn't list them all
+    max_described = 20
+
+    def __init__(self, choices, pair_types, case_sensitive=True, aliases=None):
+        self.case_sensitive = case_sensitive
+        self.lookup = None
+        self._source = (choices, pair_types, aliases)
+        if aliases:
+            # Report aliases to unknown choices when the validator is constructed
+            self._build()
+
+    def _build(self):
+        choices, pair_types, aliases = self._source
+        if _is_enum_class(choices):
+            values = list(choices.keys())
+        elif isinstance(choices, (list, tuple)) and choices and isinstance(choices[0], pair_types):
+            values = [x[0] for x in choices]
+        else:
+            values = list(choices)
+
+        # Unhashable choices (e.g. lists) are compared one by one, like `value in choices`
+        unhashable = []
+        try:
+            if self.case_sensitive:
+                lookup = dict(zip(values, values))
+            else:
+                lookup = dict((self._key(v), v) for v in values)
+        except TypeError:
+            lookup = {}
+            for v in values:
+                try:
+                    lookup[self._key(v)] = v
+                except TypeError:
+                    unhashable.append(v)
+        for alias, choice in (aliases or {}).items():
+            if choice not in values:
+                raise ValueError('Alias %r refers to %r which is not a valid choice' % (alias, choice))
+            lookup.setdefault(self._key(alias), choice)
+        self.values = values
+        self.unhashable = unhashable
+        self._description = None
+        self.lookup = lookup
+        return lookup
+
+    def _key(self, value):
+        if not self.case_sensitive and isinstance(value, basestring):
+            return value.lower()
+        return value
+
+    def find(self, value):
+        '''Returns the matching choice, or _missing'''
+        lookup = self.lookup
+        if lookup is None:
+            lookup = self._build()
+        key = self._key(value)
+        try:
+            choice = lookup.get(key, _missing)
+        except TypeError:
+            choice = _missing
+        if choice is _missing and self.unhashable:
+            for v in self.unhashable:
+                if self._key(v) == key:
+                    return v
+        return choice
+
+    def describe(self, separator, convert):
+        if self.lookup is None:
+            self._build()
+        if self._description is None:
+            values = self.values[:self.max_described]
+            description = separator.join([convert(c) for c in values])
+            if len(self.values) > self.max_described:
+                description += '%s... (%d more)' % (separator, len(self.values) - self.max_described)
+            self._description = description
+        return self._description
+
+
+def _char_index(constraints):
+    '''Expands a list of character codes and inclusive (first, last) ranges into a lookup dict'''
+    index = {}
+    for v in constraints:
+        if isinstance(v, int):
+            index[v] = True
+        elif isinstance(v, tuple):
+            for v1 in range(v[0], v[1] + 1):
+                index[v1] = True
+    return index
 
 
 class Validator(object):
+    """
+    Validators are immutable once constructed, and equal (and hash equal) when
+    their configuration is.  intern() returns one shared instance per
+    configuration.
+
+    >>> Unicode(max_length=255) == Unicode(max_length=255), Unicode(max_length=255) == Unicode(max_length=10)
+    (True, False)
+    >>> Unicode.intern(max_length=255) is Unicode.intern(None, 255)
+    True
+    >>> Email().max_length = 10
+    Traceback (most recent call last):
+    ...
+    AttributeError: Email instances are immutable
+    """
+    __metaclass__ = _ValidatorType
+    __slots__ = ('__weakref__', '_thawed', '_hash', '_config_cache')
+
+    @classmethod
+    def intern(cls, *args, **kwargs):
+        '''Returns the shared instance configured like cls(*args, **kwargs), creating it on first use'''
+        key = (cls, args, tuple(sorted(kwargs.items()))) if kwargs else (cls, args)
+        try:
+            hash(key)
+        except TypeError:
+            # e.g. a list of choices
+            key = (cls, _freeze(args), _freeze(kwargs))
+            try:
+                hash(key)
+            except TypeError:
+                key = None
+
+        validator = None if key is None else _interned_calls.get(key)
+        if validator is None:
+            validator = cls(*args, **kwargs)
+            with _intern_lock:
+                if len(_interned) >= _INTERN_CACHE_SIZE or len(_interned_calls) >= _INTERN_CACHE_SIZE:
+                    _interned.clear()
+                    _interned_calls.clear()
+                validator = _interned.setdefault((cls, validator._config()), validator)
+                if key is not None:
+                    _interned_calls[key] = validator
+        return validator
+
+    def _config(self):
+        try:
+            return self._config_cache
+        except AttributeError:
+            pass
+
+        config = tuple((name, _freeze(getattr(self, name, None))) for name in _config_names(type(self)))
+        if hasattr(self, '__dict__'):
+            # Subclasses without __slots__
+            config += tuple(sorted((k, _freeze(v)) for k, v in self.__dict__.items() if not k.startswith('_')))
+        if not getattr(self, '_thawed', False):
+            # Compared on every __eq__, e.g. as a dict key, and O(len(choices)) to build for Enum/Type
+            object.__setattr__(self, '_config_cache', config)
+        return config
+
+    def __setattr__(self, name, value):
+        if not getattr(self, '_thawed', False):
+            raise AttributeError('%s instances are immutable' % type(self).__name__)
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        if not getattr(self, '_thawed', False):
+            raise AttributeError('%s instances are immutable' % type(self).__name__)
+        object.__delattr__(self, name)
+
+    def __eq__(self, other):
+        return self is other or type(self) is type(other) and self._config() == other._config()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            value = hash((type(self), self._config()))
+            object.__setattr__(self, '_hash', value)
+            return value
+
+    def __getstate__(self):
+        state = {}
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name not in ('__weakref__', '_thawed', '_hash', '_config_cache') and hasattr(self, name):
+                    state[name] = getattr(self, name)
+        if hasattr(self, '__dict__'):
+            state.update(self.__dict__)
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
     def is_empty(self, value):
-        return value is None or isinstance(value, (str, unicode)) and not bool(value.strip())
+        return _is_blank(value)
 
     def to_python(self, value):
         if self.is_empty(value):
@@ -57,6 +519,71 @@ class Validator(object):
     def from_python(self, value):
         return self._from_python(value)
 
+    def check(self, value):
+        '''Like to_python but returns (result, None), or (None, Invalid) if value is rejected, instead of raising'''
+        if _native_check(self):
+            return self._check(value)
+        try:
+            return self.to_python(value), None
+        except ValidationException, e:
+            return None, Invalid.from_exception(e)
+
+    def to_python_many(self, values):
+        '''Validates an iterable of values.
+
+        Returns (results, errors) where results has one entry per value (None for
+        invalid values) and errors maps the index of each invalid value to its
+        ValidationException.
+        '''
+        results = []
+        errors = {}
+        append = results.append
+
+        if _native_check(self):
+            results, invalids = self.check_many(values)
+            return results, dict((i, invalid.exception()) for i, invalid in invalids.items())
+
+        if not _inherits(self, Validator, 'to_python'):
+            to_python = self.to_python
+            for i, value in enumerate(values):
+                try:
+                    append(to_python(value))
+                except ValidationException, e:
+                    errors[i] = e
+                    append(None)
+            return results, errors
+
+        is_empty = self.is_empty
+        _to_python = self._to_python
+        _validate = self._validate
+        for i, value in enumerate(values):
+            if is_empty(value):
+                append(None)
+                continue
+            try:
+                append(_validate(_to_python(value)))
+            except ValidationException, e:
+                errors[i] = e
+                append(None)
+        return results, errors
+
+    def check_many(self, values):
+        '''Like to_python_many but errors maps indexes to Invalid instead of ValidationException'''
+        results = []
+        errors = {}
+        append = results.append
+        check = self._check if _native_check(self) else self.check
+        for i, value in enumerate(values):
+            result, invalid = check(value)
+            if invalid is not None:
+                errors[i] = invalid
+            append(result)
+        return results, errors
+
+    def from_python_many(self, values):
+        from_python = self.from_python
+        return [from_python(value) for value in values]
+
     def _to_python(self, value):
         return value
 
@@ -89,36 +616,82 @@ class Integer(Validator):
     Traceback (most recent call last):
     ...
     ValidationException: Please enter an integer - [c]
+    >>> i.to_python_many(['1', '', 'c'])
+    ([1, None, None], {2: ValidationException('Please enter an integer - [c]',)})
+    >>> i.check('5'), i.check('c')
+    ((5, None), (None, Invalid('Please enter an integer - [c]')))
+    >>> i.check_many(['1', '11'])
+    ([1, None], {1: Invalid('Value must not be greater than 10')})
+    >>> i.from_python_many([1000, 5])
+    ['1,000', '5']
+    >>> i.to_python(memoryview('id=7;')[3:4]), i.to_python(bytearray('  '))
+    (7, None)
 
     """
+    __slots__ = ('min', 'max')
 
     def __init__(self, min=None, max=None):
-        self.min = min
-        self.max = max
+        object.__setattr__(self, 'min', min)
+        object.__setattr__(self, 'max', max)
 
     def _to_python(self, value):
         if isinstance(value, (str, unicode)):
             value = value.replace(',', '')
+        elif type(value) in _BUFFER_TYPES:
+            value = _buffer_bytes(value).replace(',', '')
 
         try:
             value = int(value)
         except ValueError:
-            raise ValidationException('Please enter an integer - [%s]' % value)
+            raise ValidationException('Please enter an integer - [%s]', message_args=(value,))
 
         if self.min is not None and value is not None and value < self.min:
-            raise ValidationException('Values must not be less than %d' % (self.min,))
+            raise ValidationException('Values must not be less than %d', message_args=(self.min,))
 
         if self.max is not None and value > self.max:
-            raise ValidationException('Value must not be greater than %d' % (self.max,))
+            raise ValidationException('Value must not be greater than %d', message_args=(self.max,))
 
         return value
 
+    _check_inherits = ('to_python', 'is_empty', '_to_python', '_validate')
+
+    def _check(self, value):
+        if value is None:
+            return None, None
+        if type(value) in _BUFFER_TYPES:
+            value = _buffer_bytes(value)
+        if isinstance(value, basestring):
+            if not value.strip():
+                return None, None
+            value = value.replace(',', '')
+
+        try:
+            value = int(value)
+        except ValueError:
+            return None, Invalid('Please enter an integer - [%s]', (value,))
+
+        if self.min is not None and value < self.min:
+            return None, Invalid('Values must not be less than %d', (self.min,))
+        if self.max is not None and value > self.max:
+            return None, Invalid('Value must not be greater than %d', (self.max,))
+        return value, None
+
+    _number_format = NumberFormat()
+
     def _from_python(self, value):
         if isinstance(value, (int, float, long, decimal.Decimal)):
-            return '%s' % split_thousands(int(value))
+            return self._number_format.format(value)
         else:
             return value
 
+    def from_python_many(self, values):
+        if not _inherits(self, Integer, 'from_python', '_from_python'):
+            return Validator.from_python_many(self, values)
+
+        format = self._number_format.format
+        types = (int, float, long, decimal.Decimal)
+        return [format(value) if isinstance(value, types) else value for value in values]
+
 
 class Decimal(Validator):
     """
@@ -140,41 +713,123 @@ class Decimal(Validator):
     Traceback (most recent call last):
     ...
     ValidationException: Please enter a number - [c]
+    >>> d.to_python(memoryview('5')), Decimal().to_python(bytearray('1,000.5'))
+    (Decimal('5.00'), Decimal('1000.50'))
+    >>> d.to_python('NaN')
+    Traceback (most recent call last):
+    ...
+    ValidationException: Please enter a number - [NaN]
+    >>> d.to_python(float('inf'))
+    Traceback (most recent call last):
+    ...
+    ValidationException: Please enter a number - [inf]
+    >>> Decimal().to_python('123456789012345678901234567890.12')
+    Decimal('123456789012345678901234567890.12')
+    >>> Decimal().to_python('0.015'), Decimal().to_python('10.345') # ties round half even on the decimal input
+    (Decimal('0.02'), Decimal('10.34'))
     """
+    __slots__ = ('min', 'max', 'rounding', 'scale', '_min', '_max', '_quantum', '_context', '_number_format')
+
+    _formatted_types = (float, int, decimal.Decimal)
+    _format_prefix = ''
 
     def __init__(self, min=None, max=None, rounding=decimal.ROUND_HALF_EVEN, scale=2):
-        self.min = min
-        self.max = max
-        self.rounding = rounding
-        self.scale = scale
+        object.__setattr__(self, 'min', min)
+        object.__setattr__(self, 'max', max)
+        object.__setattr__(self, 'rounding', rounding)
+        object.__setattr__(self, 'scale', scale)
+
+        object.__setattr__(self, '_min', None if min is None else decimal.Decimal(str(min)))
+        object.__setattr__(self, '_max', None if max is None else decimal.Decimal(str(max)))
+        quantum, context, number_format = _decimal_parts(scale, rounding, self._format_prefix)
+        object.__setattr__(self, '_quantum', quantum)
+        object.__setattr__(self, '_context', context)
+        object.__setattr__(self, '_number_format', number_format)
+
+    def _parse(self, value):
+        '''Converts value to a decimal.Decimal quantized to scale places, None if it isn't a finite number'''
+        if isinstance(value, basestring):
+            value = value.replace(',', '').strip()
+            m = _plain_decimal_re.match(value)
+            if m is not None:
+                sign, whole, fraction = m.groups()
+                if fraction is None:
+                    fraction = ''
+                if (whole or fraction) and len(fraction) <= self.scale:
+                    # Already representable at this scale, pad instead of paying for quantize()
+                    return decimal.Decimal('%s%s.%s' % (sign, whole or '0', fraction.ljust(self.scale, '0')))
+        elif isinstance(value, (int, long)):
+            return decimal.Decimal('%d.%s' % (value, '0' * self.scale))
+        elif isinstance(value, float):
+            value = repr(value)
+        elif type(value) in _BUFFER_TYPES:
+            return self._parse(_buffer_bytes(value))
+        elif not isinstance(value, decimal.Decimal):
+            try:
+                value = repr(float(value))
+            except ValueError:
+                return None
 
-    def _to_python(self, value):
-        if isinstance(value, (str, unicode)):
-            value = value.replace(',', '')
         try:
-            if not isinstance(value, float):
-                value = float(value)
-
-            value = decimal.Decimal(('%%0.%df' % self.scale) % value)
-        except ValueError:
-            raise ValidationException('Please enter a number - [%s]' % value)
-
-        if self.min is not None and value < decimal.Decimal(str(self.min)):
-            raise ValidationException('Value must not be less than %d' % (self.min,))
+            value = decimal.Decimal(value)
+            if not value.is_finite():
+                return None
+            return value.quantize(self._quantum, context=self._context)
+        except decimal.InvalidOperation:
+            return None
 
-        if self.max is not None and value > decimal.Decimal(str(self.max)):
-            raise ValidationException('Value must not be greater than %d' % (self.max,))
+    def _to_python(self, value):
+        if type(value) in _BUFFER_TYPES:
+            value = _buffer_bytes(value)
+        result = self._parse(value)
+        if result is None:
+            if isinstance(value, basestring):
+                value = value.replace(',', '')
+            raise ValidationException('Please enter a number - [%s]', message_args=(value,))
+        return self._check_bounds(result)
+
+    def _check_bounds(self, value):
+        if self._min is not None and value < self._min:
+            raise ValidationException('Value must not be less than %d', message_args=(self.min,))
+
+        if self._max is not None and value > self._max:
+            raise ValidationException('Value must not be greater than %d', message_args=(self.max,))
 
         return value
 
+    _check_inherits = ('to_python', 'is_empty', '_to_python', '_validate', '_parse', '_check_bounds')
+
+    def _check(self, value):
+        if _is_blank(value):
+            return None, None
+        if type(value) in _BUFFER_TYPES:
+            value = _buffer_bytes(value)
+
+        result = self._parse(value)
+        if result is None:
+            if isinstance(value, basestring):
+                value = value.replace(',', '')
+            return None, Invalid('Please enter a number - [%s]', (value,))
+        if self._min is not None and result < self._min:
+            return None, Invalid('Value must not be less than %d', (self.min,))
+        if self._max is not None and result > self._max:
+            return None, Invalid('Value must not be greater than %d', (self.max,))
+        return result, None
+
     def _from_python(self, value):
-        if isinstance(value, (float, int, decimal.Decimal)):
-            if isinstance(value, float):
-                value = '%f' % value
-            return split_thousands(unicode(decimal.Decimal(value).quantize(decimal.Decimal('.' + ('0' * (self.scale - 1)) + '1'), rounding=self.rounding)))
+        if isinstance(value, self._formatted_types):
+            return self._number_format.format(value)
         else:
             return value
 
+    def from_python_many(self, values):
+        if not _inherits(self, Decimal, 'from_python', '_from_python'):
+            return Validator.from_python_many(self, values)
+
+        format = self._number_format.format
+        types = self._formatted_types
+        return [format(value) if isinstance(value, types) else value for value in values]
+
 
 class Currency(Decimal):
     """
@@ -210,34 +865,41 @@ class Currency(Decimal):
     ...
     ValidationException: Please enter a number - [c]
     """
-    _currency = re.compile(r'^(?P<sign1>[+-])?\$?(?P<sign2>[+-])?(?P<digits>\d*(?:,\d\d\d)*)(?P<cents>\.\d{1,2})?$', re.I)
+    __slots__ = ()
+
+    _formatted_types = (int, float, long, decimal.Decimal)
+    _format_prefix = '$'
+    _currency = _LazyRegex('_currency', r'^(?P<sign1>[+-])?\$?(?P<sign2>[+-])?(?P<digits>\d*(?:,\d\d\d)*)(?:\.(?P<cents>\d{1,2}))?$', re.I)
 
     def is_empty(self, value):
         if value is None:
             return True
+        if type(value) in _BUFFER_TYPES:
+            value = _buffer_bytes(value)
         value = unicode(value).strip()
         return value == '' or value == '$'
 
     def _to_python(self, value):
+        if type(value) in _BUFFER_TYPES:
+            value = _buffer_bytes(value)
         if isinstance(value, (str, unicode)):
-            match = self._currency.search(unicode(value))
+            match = self._currency.match(value)
             if not match:
-                raise ValidationException('Please enter a number - [%s]' % value)
-            d = match.groupdict()
-            if not d['digits'] and not d['cents']:
-                raise ValidationException('Please enter a number - [%s]' % value)
-            sign = d['sign2'] or d['sign1'] or ''
-            return Decimal._to_python(self, '%s%s%s' % (sign, d['digits'].replace(',', ''), d['cents'] or '.00'))
+                raise ValidationException('Please enter a number - [%s]', message_args=(value,))
+            sign1, sign2, digits, cents = match.groups()
+            if not digits and cents is None:
+                raise ValidationException('Please enter a number - [%s]', message_args=(value,))
+
+            text = '%s%s.%s' % (sign2 or sign1 or '', digits.replace(',', '') or '0', cents or '')
+            if cents is not None and len(cents) > self.scale:
+                result = decimal.Decimal(text).quantize(self._quantum, context=self._context)
+            else:
+                result = decimal.Decimal(text + '0' * (self.scale - len(cents or '')))
+            return self._check_bounds(result)
 
         else:
             return Decimal._to_python(self, value)
 
-    def _from_python(self, value):
-        if isinstance(value, (int, float, long, decimal.Decimal)):
-            return '$%s' % Decimal._from_python(self, value)
-        else:
-            return value
-
 
 class Unicode(Validator):
     """
@@ -251,27 +913,75 @@ class Unicode(Validator):
     >>> u.to_python(123456789)
     u'123456789'
     """
+    __slots__ = ('min_length', 'max_length', 'truncate')
+
     def __init__(self, min_length=None, max_length=None, truncate=False):
-        self.min_length = min_length
-        self.max_length = max_length
-        self.truncate = truncate
+        object.__setattr__(self, 'min_length', min_length)
+        object.__setattr__(self, 'max_length', max_length)
+        object.__setattr__(self, 'truncate', truncate)
 
     def _to_python(self, value):
         if not isinstance(value, (unicode)):
+            if type(value) in _BUFFER_TYPES:
+                value = _buffer_bytes(value)
             if isinstance(value, str):
                 value = unicode(value, errors='ignore')
             else:
                 value = unicode(value)
         return value
 
-    def _validate(self, value):
+    def _check_length(self, value):
+        '''Returns an Invalid if value is too short or too long, otherwise None'''
         if self.min_length and len(value) < self.min_length:
-            raise MinLengthException('Please enter a string no shorter than than %d characters' % self.min_length)
+            return Invalid('Please enter a string no shorter than than %d characters', (self.min_length,), exception_class=MinLengthException)
 
         if self.max_length and not self.truncate and len(value) > self.max_length:
-            raise MaxLengthException('Please enter a string no more than %d characters' % self.max_length)
+            return Invalid('Please enter a string no more than %d characters', (self.max_length,), exception_class=MaxLengthException)
+        return None
+
+    def _validate(self, value):
+        invalid = self._check_length(value)
+        if invalid is not None:
+            raise invalid.exception()
         return value
 
+    _check_inherits = ('to_python', 'is_empty', '_to_python', '_validate', '_check_length')
+
+    def _check(self, value):
+        if value is None:
+            return None, None
+        if not isinstance(value, unicode):
+            if type(value) in _BUFFER_TYPES:
+                value = _buffer_bytes(value)
+            if isinstance(value, str):
+                if not value.strip():
+                    return None, None
+                value = unicode(value, errors='ignore')
+            else:
+                value = unicode(value)
+        elif not value.strip():
+            return None, None
+
+        invalid = self._check_length(value)
+        if invalid is not None:
+            return None, invalid
+        return value, None
+
+
+class Strip(Unicode):
+    """Converts to unicode with the surrounding whitespace removed, mostly useful as a Chain stage.
+
+    >>> Strip().to_python('  hello ')
+    u'hello'
+    """
+    __slots__ = ()
+
+    def __init__(self):
+        Unicode.__init__(self)
+
+    def _to_python(self, value):
+        return Unicode._to_python(self, value).strip()
+
 
 class Enum(Unicode):
     """
@@ -282,7 +992,10 @@ class Enum(Unicode):
     Traceback (most recent call last):
     ...
     ValidationException: Valid choices are: one, two, three. You provided [zero]
-    >>> from openmile.lib import enum
+    >>> e = Enum(['one', 'two'], case_sensitive=False, aliases={'uno': 'one'})
+    >>> e.to_python('TWO'), e.to_python('Uno')
+    (u'two', u'one')
+    >>> import enum21 as enum
     >>> class E(enum.Enum):
     ...     A = '1'
     ...     B = '2'
@@ -291,28 +1004,27 @@ class Enum(Unicode):
     >>> e.to_python('1')
     u'1'
     """
+    __slots__ = ('choices', 'case_sensitive', 'aliases', '_index')
 
-    def __init__(self, choices, max_length=None, truncate=False):
-        self.choices = choices
-        if max_length is None and inspect.isclass(self.choices) and issubclass(self.choices, enum.Enum):
+    def __init__(self, choices, max_length=None, truncate=False, case_sensitive=True, aliases=None):
+        object.__setattr__(self, 'choices', choices)
+        object.__setattr__(self, 'case_sensitive', case_sensitive)
+        object.__setattr__(self, 'aliases', aliases)
+        if max_length is None and _is_enum_class(self.choices):
             max_length = self.choices.max_length()
         Unicode.__init__(self, max_length=max_length, truncate=truncate)
 
+        object.__setattr__(self, '_index', _ChoiceIndex(choices, (list, tuple), case_sensitive, aliases))
+
     def _to_python(self, value):
         value = Unicode._to_python(self, value).strip()
 
-        if inspect.isclass(self.choices) and issubclass(self.choices, enum.Enum):
-            choices = self.choices.keys()
-        elif isinstance(self.choices, list):
-            if isinstance(self.choices[0], (list, tuple)):
-                choices = [x[0] for x in self.choices]
-            else:
-                choices = self.choices
-        else:
-            choices = self.choices
-
-        if value not in choices:
-            raise ValidationException('Valid choices are: %s. You provided [%s]' % (', '.join([unicode(c) for c in choices]), value))
+        choice = self._index.find(value)
+        if choice is _missing:
+            raise ValidationException('Valid choices are: %s. You provided [%s]', message_args=(self._index.describe(', ', unicode), value))
+        if choice != value:
+            # Matched through an alias or case insensitively, hand back the real choice
+            return unicode(choice)
         return value
 
 
@@ -335,7 +1047,19 @@ class Date(Validator):
     Traceback (most recent call last):
     ...
     ValidationException: month must be in 1..12
+    >>> d.to_python('1989-12-02T05:45'), d.to_python('1989-12-02T05:45:52')
+    (datetime.date(1989, 12, 2), datetime.date(1989, 12, 2))
+    >>> d.to_python('1989-02-30') # out of range, dateutil reports it # doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+    ...
+    ValidationException: day is out of range for month
+    >>> d.to_python('1' * 30) # doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+    ...
+    ValidationException: Python int too large to convert to C long
     """
+    __slots__ = ()
+
     def _to_python(self, value):
         if isinstance(value, datetime):
             return value.date()
@@ -346,11 +1070,11 @@ class Date(Validator):
         value = str(value)
 
         try:
-            result = parse(value).date()
+            result = (_fast_datetime(value) or parse(value)).date()
             if result.year < 1900:
                 raise ValidationException('Year must be after 1900')
             return result
-        except ValueError, e:
+        except (ValueError, OverflowError), e:
             raise ValidationException(e.message)
 
     def _from_python(self, value):
@@ -358,6 +1082,42 @@ class Date(Validator):
             return value.strftime('%m/%d/%Y')
         return value
 
+    def to_python_many(self, values):
+        if not _inherits(self, Date, 'to_python', 'is_empty', '_to_python', '_validate'):
+            return Validator.to_python_many(self, values)
+
+        results = []
+        errors = {}
+        append = results.append
+        for i, value in enumerate(values):
+            if value is None:
+                append(None)
+                continue
+            if isinstance(value, datetime):
+                append(value.date())
+                continue
+            if isinstance(value, date):
+                append(value)
+                continue
+            if _is_blank(value):
+                append(None)
+                continue
+
+            value = str(value)
+            try:
+                result = _fast_datetime(value) or parse(value)
+            except (ValueError, OverflowError), e:
+                errors[i] = ValidationException(e.message)
+                append(None)
+                continue
+
+            if result.year < 1900:
+                errors[i] = ValidationException('Year must be after 1900')
+                append(None)
+            else:
+                append(result.date())
+        return results, errors
+
 
 class Time(Validator):
     """
@@ -380,19 +1140,42 @@ class Time(Validator):
     Traceback (most recent call last):
     ...
     ValidationException: Invalid time format, please use XX:XX
+    >>> t.to_python('12:30AM'), t.to_python('12:30PM'), t.to_python('1:15pm')
+    (datetime.time(0, 30), datetime.time(12, 30), datetime.time(13, 15))
+    >>> t.to_python('0:30AM') # not a 12 hour time, left to dateutil
+    datetime.time(0, 30)
+    >>> t.to_python('13:30PM') # doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+    ...
+    ValidationException: Unknown string format
     """
+    __slots__ = ()
 
-    time_re = re.compile(r"^(\d{1,2}):?(\d\d)(:?\d\d)?(\s*AM|PM)?$", re.I)
+    time_re = _LazyRegex('time_re', r"^(\d{1,2}):?(\d\d)(:?\d\d)?(\s*AM|PM)?$", re.I)
 
     def _to_python(self, value):
         if isinstance(value, time):
             return value
 
-        value = str(value)
+        value = _buffer_bytes(value) if type(value) in _BUFFER_TYPES else str(value)
 
         m = self.time_re.match(value)
         if not m:
             raise ValidationException('Invalid time format, please use XX:XX')
+
+        hour, minute, second, meridiem = m.groups()
+        hour = int(hour)
+        minute = int(minute)
+        second = int(second.replace(':', '')) if second is not None else 0
+        if meridiem is not None:
+            meridiem = meridiem.strip().upper()
+            if 1 <= hour <= 12:
+                hour = hour % 12 + (12 if meridiem == 'PM' else 0)
+            else:
+                hour = 24  # out of range for the fast path, let dateutil report it
+        if hour < 24 and minute < 60 and second < 60:
+            return time(hour, minute, second)
+
         value = '%s:%s' % (m.groups()[0], m.groups()[1])
         if m.groups()[2] is not None:
             value = '%s:%s' % (value, m.groups()[2].replace(':', ''))
@@ -419,7 +1202,14 @@ class DateTime(Validator):
     Traceback (most recent call last):
     ...
     ValidationException: second must be in 0..59
+    >>> d.to_python('1989-12-03T05:45'), d.to_python('1989-12-03T05:45:52')
+    (datetime.datetime(1989, 12, 3, 5, 45), datetime.datetime(1989, 12, 3, 5, 45, 52))
+    >>> d.to_python('1989-12-03T25:00') # out of range, dateutil reports it # doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+    ...
+    ValidationException: hour must be in 0..23
     """
+    __slots__ = ()
 
     def _to_python(self, value):
         if isinstance(value, datetime):
@@ -428,8 +1218,8 @@ class DateTime(Validator):
         value = str(value)
 
         try:
-            return parse(value)
-        except ValueError, e:
+            return _fast_datetime(value) or parse(value)
+        except (ValueError, OverflowError), e:
             raise ValidationException(e.message)
 
     def _from_python(self, value):
@@ -456,12 +1246,15 @@ class Boolean(Validator):
     ...
     ValidationException: Please enter "yes" or "no"
     """
+    __slots__ = ()
 
     true_values = ['true', 't', 'yes', 'y', 'on', '1', 'yeah', 'yah', 'yup']
     false_values = ['false', 'f', 'no', 'n', 'off', '0', '2', 'nah', 'nope']
     none_values = ['none']
 
     def _to_python(self, value):
+        if type(value) in _BUFFER_TYPES:
+            value = _buffer_bytes(value)
         if isinstance(value, (str, unicode)):
             value = value.strip().lower()
             if value in self.true_values:
@@ -477,6 +1270,24 @@ class Boolean(Validator):
     def _from_python(self, value):
         return str(value)
 
+    _check_inherits = ('to_python', 'is_empty', '_to_python', '_validate')
+
+    def _check(self, value):
+        if value is None:
+            return None, None
+        if type(value) in _BUFFER_TYPES:
+            value = _buffer_bytes(value)
+        if isinstance(value, basestring):
+            value = value.strip().lower()
+            if value in self.true_values:
+                return True, None
+            if value in self.false_values:
+                return False, None
+            if not value or value in self.none_values:
+                return None, None
+            return None, Invalid('Please enter "yes" or "no"')
+        return bool(value), None
+
 
 class Type(Integer):
     """Use for types where applicable (alert type, event type etc.) Likely indexed so use integer type.
@@ -488,7 +1299,13 @@ class Type(Integer):
     Traceback (most recent call last):
     ...
     ValidationException: Valid choices are: 1,2,3. You provided [4]
-    >>> from openmile.lib import enum
+    >>> Type(range(100)).to_python(100)
+    Traceback (most recent call last):
+    ...
+    ValidationException: Valid choices are: 0,1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,... (80 more). You provided [100]
+    >>> Type([[1, 'a'], 2]).to_python(2) # unhashable choices are compared one by one
+    2
+    >>> import enum21 as enum
     >>> class E(enum.Enum):
     ...     A = 1
     ...     B = 2
@@ -497,23 +1314,23 @@ class Type(Integer):
     >>> t.to_python(1)
     1
     """
-    def __init__(self, choices, min=None, max=None):
-        self.choices = choices
+    __slots__ = ('choices', 'aliases', '_index')
+
+    def __init__(self, choices, min=None, max=None, aliases=None):
+        object.__setattr__(self, 'choices', choices)
+        object.__setattr__(self, 'aliases', aliases)
         Integer.__init__(self, min=min, max=max)
 
+        object.__setattr__(self, '_index', _ChoiceIndex(choices, tuple, True, aliases))
+
     def _to_python(self, value):
         value = Integer._to_python(self, value)
 
-        if inspect.isclass(self.choices) and issubclass(self.choices, enum.Enum):
-            choices = self.choices.keys()
-        else:
-            if self.choices and isinstance(self.choices[0], tuple):
-                choices = [x[0] for x in self.choices]
-            else:
-                choices = self.choices
-
-        if value not in choices:
-            raise ValidationException('Valid choices are: %s. You provided [%s]' % (','.join(map(lambda x: str(x), choices)), value))
+        choice = self._index.find(value)
+        if choice is _missing:
+            raise ValidationException('Valid choices are: %s. You provided [%s]', message_args=(self._index.describe(',', str), value))
+        if choice != value:
+            return choice
         return value
 
 
@@ -551,52 +1368,114 @@ class PhoneNumber(Unicode):
     '(234) 567-8901'
     >>> p.from_python('2345637') # Unrecognized length, ignored
     '2345637'
+    >>> class Blankable(PhoneNumber):
+    ...     def is_empty(self, value):
+    ...         return value == 'n/a' or PhoneNumber.is_empty(self, value)
+    >>> Blankable().to_python('n/a'), Blankable().check('n/a'), Blankable().to_python('223-456-7890')
+    (None, (None, None), u'2234567890')
     """
-    _phoneRE = re.compile(r"""
-                    # don't match beginning of string, number can start anywhere
-        (\d*)       # can optionally start with country code digits
-        \D*         # optional separator
-        ([2-9]\d{2})     # area code is 3 digits starting with 2-9 (e.g. '800')
-        \D*         # optional separator is any number of non-digits
-        (\d{3})     # trunk is 3 digits (e.g. '555')
-        \D*         # optional separator
-        (\d{4})     # rest of number is 4 digits (e.g. '1212')
-        $           # end of string
-        """, re.VERBOSE)
-    # the following is to deal with things like 000-000-0000, especially in RMIS Carrier data
-    _phonezeroRE = re.compile(r"""
-                    # don't match beginning of string, number can start anywhere
-        ([0]{3})    # area code is 3 digits starting with 2-9 (e.g. '800')
-        \D*         # optional separator is any number of non-digits
-        ([0]{3})    # trunk is 3 digits (e.g. '555')
-        \D*         # optional separator
-        ([0]{4})    # rest of number is 4 digits (e.g. '1212')
-        $           # end of string
-        """, re.VERBOSE)
+    __slots__ = ()
+
+    _digit_runs = _LazyRegex('_digit_runs', r'\d+')
+    _invalid_message = 'Please enter a 10 digit phone number with optional +country code in the format +#* ###-###-####'
 
     def __init__(self, max_length=16, truncate=False):
         Unicode.__init__(self, max_length=max_length, truncate=truncate)
 
+    def _normalize(self, value):
+        """Splits value into (country code digits, 10 digit number) in one scan, None if it isn't a phone number.
+
+        The number must end the string and be made of a 3 digit area code, a 3
+        digit trunk and 4 digits, optionally separated by non-digits (e.g.
+        '223-456-7890').  Any digits directly before the area code are the
+        country code.  The area code isn't checked here so that 000-000-0000
+        (common in RMIS Carrier data) can be recognized as empty.
+        """
+        runs = self._digit_runs.findall(value)
+        if not runs or not value.endswith(runs[-1]):
+            return None
+
+        # Walk back over the runs of digits making up the last 10 digits, the
+        # only places separators may appear are after the area code and trunk
+        need = 10
+        i = len(runs) - 1
+        while len(runs[i]) < need:
+            need -= len(runs[i])
+            if need != 3 and need != 6 or i == 0:
+                return None
+            i -= 1
+
+        run = runs[i]
+        if len(run) > need:
+            country = run[:-need]
+        elif i > 0:
+            country = runs[i - 1]
+        else:
+            country = ''
+        return country, ''.join(runs[i:])[-10:]
+
     def is_empty(self, value):
         value = Unicode._to_python(self, value or '')
-        match = self._phonezeroRE.search(value)
-        if match:
+        parts = self._normalize(value)
+        if parts is not None and parts[1] == '0000000000':
             return True
-        else:
-            return Unicode.is_empty(self, value)
+        return Unicode.is_empty(self, value)
 
-    def _to_python(self, value):
-        value = Unicode._to_python(self, value)
-        match = self._phoneRE.search(value)
-        if not match:
-            raise ValidationException('Please enter a 10 digit phone number with optional +country code in the format +#* ###-###-####')
+    def to_python(self, value):
+        if not _native_check(self):
+            # A subclass replaced is_empty or _to_python (or another step _check fuses), run them separately
+            return Validator.to_python(self, value)
+
+        # is_empty and _to_python share one conversion and scan of the value
+        text = Unicode._to_python(self, value or '')
+        parts = self._normalize(text)
+        if parts is None:
+            if not text.strip():
+                return None
+            raise ValidationException(self._invalid_message)
+        if parts[1] == '0000000000':
+            return None
+        number = self._format(parts)
+        if number is None:
+            raise ValidationException(self._invalid_message)
+        return self._validate(number)
 
-        python_number = ''.join(filter(None, match.groups()))
-        if match.groups(0) is not None:
+    def _to_python(self, value):
+        parts = self._normalize(Unicode._to_python(self, value))
+        number = None if parts is None else self._format(parts)
+        if number is None:
+            raise ValidationException(self._invalid_message)
+        return number
+
+    def _format(self, parts):
+        '''Joins the parts from _normalize into the stored form, None if the area code is invalid'''
+        country, number = parts
+        if number[0] in '01':
+            return None
+        if country:
             # International number
-            python_number = '+' + python_number
-
-        return python_number
+            return u'+%s%s' % (country, number)
+        return number
+
+    _check_inherits = ('to_python', 'is_empty', '_to_python', '_normalize', '_format', '_validate', '_check_length')
+
+    def _check(self, value):
+        text = Unicode._to_python(self, value or '')
+        parts = self._normalize(text)
+        if parts is None:
+            if not text.strip():
+                return None, None
+            return None, Invalid(self._invalid_message)
+        if parts[1] == '0000000000':
+            return None, None
+
+        number = self._format(parts)
+        if number is None:
+            return None, Invalid(self._invalid_message)
+        invalid = self._check_length(number)
+        if invalid is not None:
+            return None, invalid
+        return number, None
 
     def _from_python(self, value):
         if not isinstance(value, (str, unicode)):
@@ -645,9 +1524,18 @@ class Email(Unicode):
     Traceback (most recent call last):
     ...
     ValidationException: The username portion of the email address is invalid (the portion before the @: glen ch)
+    >>> e.to_python_many(['a@openmile.com', 'b@openmile.com', 'c@openmile'])[1].keys()
+    [2]
+    >>> class Corp(Email):
+    ...     domainRE = re.compile(r'^corp\.com$')
+    >>> Corp().to_python('a@openmile.com')
+    Traceback (most recent call last):
+    ...
+    ValidationException: The domain portion of the email address is invalid (the portion after the @: openmile.com)
 
 
     """
+    __slots__ = ()
 
     # http://en.wikipedia.org/wiki/Email_address#Local_part
     # special characters are rarely used and discouraged
@@ -658,26 +1546,25 @@ class Email(Unicode):
                               33, (35, 39), 42, 43, 45, 47, 61, 63, (94, 96), (123, 126),  # !#$%&'*+-/=?^_`{|}~
                               46,  # .
                               ]
-    domainRE = re.compile(r"""
+    domainRE = _LazyRegex('domainRE', r"""
         ^(?:[a-z0-9][a-z0-9\-]{0,62}\.)+ # (sub)domain - alpha followed by 62max chars (63 total)
         [a-z]{2,}$                       # TLD
     """, re.I | re.VERBOSE)
 
+    char_index = _char_index(local_part_constraints)
+    _username_re = _LazyRegex('_username_re', u'[%s]*\\Z' % u''.join(re.escape(unichr(c)) for c in sorted(char_index)))
+
+    # Verdicts keyed by (domainRE, domain) so subclasses with their own domainRE don't share them,
+    # shared by all instances and cleared when it reaches _domain_cache_size
+    _domain_cache = {}
+    _domain_cache_size = 10000
+
     def __init__(self, max_length=255, truncate=False):
         Unicode.__init__(self, max_length=max_length, truncate=truncate)
 
-        self.char_index = {}
-        for v in self.local_part_constraints:
-            if isinstance(v, int):
-                self.char_index[v] = True
-            elif isinstance(v, tuple):
-                for v1 in range(v[0], v[1] + 1):
-                    self.char_index[v1] = True
-
     def _check_username(self, value):
-        for x in value:
-            if not self.char_index.get(ord(x), False):
-                return False
+        if not self._username_re.match(value):
+            return False
 
         if value.startswith('.') or value.endswith('.'):
             return False
@@ -685,6 +1572,17 @@ class Email(Unicode):
             return False
         return True
 
+    def _check_domain(self, domain):
+        domain_re = self.domainRE
+        key = (domain_re.pattern, domain_re.flags, domain)
+        valid = self._domain_cache.get(key)
+        if valid is None:
+            valid = domain_re.search(domain) is not None
+            if len(self._domain_cache) >= self._domain_cache_size:
+                self._domain_cache.clear()
+            self._domain_cache[key] = valid
+        return valid
+
     def _to_python(self, value):
         value = Unicode._to_python(self, value).strip()
         splitted = value.split('@', 1)
@@ -694,13 +1592,80 @@ class Email(Unicode):
             raise ValidationException('Please enter an email address in the form user@domain.com')
 
         if not self._check_username(username):
-            raise ValidationException('The username portion of the email address is invalid (the portion before the @: %s)' % username)
+            raise ValidationException('The username portion of the email address is invalid (the portion before the @: %s)', message_args=(username,))
 
-        if not self.domainRE.search(domain):
-            raise ValidationException('The domain portion of the email address is invalid (the portion after the @: %s)' % domain)
+        if not self._check_domain(domain):
+            raise ValidationException('The domain portion of the email address is invalid (the portion after the @: %s)', message_args=(domain,))
 
         return value
 
+    _check_inherits = ('to_python', 'is_empty', '_to_python', '_validate', '_check_length', '_check_username', '_check_domain')
+
+    def _check(self, value):
+        if _is_blank(value):
+            return None, None
+
+        value = Unicode._to_python(self, value).strip()
+        splitted = value.split('@', 1)
+        if len(splitted) != 2:
+            return None, Invalid('Please enter an email address in the form user@domain.com')
+        username, domain = splitted
+
+        if not self._check_username(username):
+            return None, Invalid('The username portion of the email address is invalid (the portion before the @: %s)', (username,))
+
+        if not self._check_domain(domain):
+            return None, Invalid('The domain portion of the email address is invalid (the portion after the @: %s)', (domain,))
+
+        invalid = self._check_length(value)
+        if invalid is not None:
+            return None, invalid
+        return value, None
+
+    def to_python_many(self, values):
+        if not _inherits(self, Email, 'to_python', 'is_empty', '_to_python', '_validate', '_check_length', '_check_username', '_check_domain'):
+            return Validator.to_python_many(self, values)
+
+        values = list(values)
+        to_unicode = Unicode._to_python
+        texts = [None if self.is_empty(value) else to_unicode(self, value).strip() for value in values]
+
+        # Each distinct domain is only checked once per batch
+        search = self.domainRE.search
+        domains = {}
+        for text in texts:
+            if text is not None and '@' in text:
+                domain = text.split('@', 1)[1]
+                if domain not in domains:
+                    domains[domain] = search(domain) is not None
+
+        results = []
+        errors = {}
+        append = results.append
+        check_username = self._check_username
+        check_length = self._check_length
+        for i, text in enumerate(texts):
+            if text is None:
+                append(None)
+                continue
+
+            splitted = text.split('@', 1)
+            if len(splitted) != 2:
+                invalid = Invalid('Please enter an email address in the form user@domain.com')
+            elif not check_username(splitted[0]):
+                invalid = Invalid('The username portion of the email address is invalid (the portion before the @: %s)', (splitted[0],))
+            elif not domains[splitted[1]]:
+                invalid = Invalid('The domain portion of the email address is invalid (the portion after the @: %s)', (splitted[1],))
+            else:
+                invalid = check_length(text)
+
+            if invalid is None:
+                append(text)
+            else:
+                errors[i] = invalid.exception()
+                append(None)
+        return results, errors
+
 
 # Represents the value another table/objects PrimaryID. Similar to ForeignKey but does not enforce constraint.
 class ObjectID(Integer):
@@ -716,10 +1681,93 @@ class ObjectID(Integer):
     ...
     ValidationException: Values must not be less than 1
 
+    With a resolver, a callable taking a list of ids and returning the ones that
+    exist, the referenced objects are checked too.  Batches make one resolver
+    call for all their ids.
+
+    >>> calls = []
+    >>> def resolver(ids):
+    ...     calls.append(ids)
+    ...     return [i for i in ids if i in (1, 2, 3)]
+    >>> o = ObjectID(resolver=resolver)
+    >>> o.to_python_many(['1', '2', '2', '7', 'c'])
+    ([1, 2, 2, None, None], {3: ValidationException('Object does not exist - [7]',), 4: ValidationException('Please enter an integer - [c]',)})
+    >>> calls
+    [[1, 2, 7]]
+    >>> with ObjectID.batch():
+    ...     o.missing([1, 8]), o.to_python('1'), o.to_python('2')
+    (set([8]), 1, 2)
+    >>> calls[1:]
+    [[1, 8], [2]]
+
     """
+    __slots__ = ('resolver',)
 
-    def __init__(self, min=1, max=None):
+    def __init__(self, min=1, max=None, resolver=None):
         Integer.__init__(self, min=min, max=max)
+        object.__setattr__(self, 'resolver', resolver)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def batch():
+        '''Caches resolver answers until the block exits, so each id is only looked up once'''
+        if getattr(_reference_batch, 'known', None) is not None:
+            # Already inside a batch
+            yield
+            return
+
+        _reference_batch.known = {}
+        try:
+            yield
+        finally:
+            _reference_batch.known = None
+
+    def missing(self, ids):
+        '''Returns the set of ids that don't exist, with at most one resolver call'''
+        ids = set(ids)
+        batch = getattr(_reference_batch, 'known', None)
+        if batch is None:
+            return ids - set(self.resolver(sorted(ids))) if ids else ids
+
+        known = batch.setdefault(self, {})
+        unknown = sorted(i for i in ids if i not in known)
+        if unknown:
+            found = set(self.resolver(unknown))
+            for i in unknown:
+                known[i] = i in found
+        return set(i for i in ids if not known[i])
+
+    def _validate(self, value):
+        if self.resolver is not None and self.missing([value]):
+            raise ValidationException('Object does not exist - [%s]', message_args=(value,))
+        return value
+
+    def _check(self, value):
+        result, invalid = Integer._check(self, value)
+        if result is not None and self.resolver is not None and self.missing([result]):
+            return None, Invalid('Object does not exist - [%s]', (result,))
+        return result, invalid
+
+    def check_many(self, values):
+        if self.resolver is None or not _native_check(self):
+            return Integer.check_many(self, values)
+
+        results = []
+        errors = {}
+        append = results.append
+        for i, value in enumerate(values):
+            result, invalid = Integer._check(self, value)
+            if invalid is not None:
+                errors[i] = invalid
+            append(result)
+
+        missing = self.missing(result for result in results if result is not None)
+        if missing:
+            for i, result in enumerate(results):
+                if result in missing:
+                    errors[i] = Invalid('Object does not exist - [%s]', (result,))
+                    results[i] = None
+        return results, errors
 
     def _from_python(self, value):
         if isinstance(value, (int, float, long, decimal.Decimal)):
@@ -728,6 +1776,24 @@ class ObjectID(Integer):
             return value
 
 
+def _match_digits(validator, pattern, message, value):
+    '''The digits pattern captures from value as unicode, raises message if it doesn't match'''
+    if type(value) in _BUFFER_TYPES:
+        value = _buffer_bytes(value)
+    if isinstance(value, str):
+        # Digits only, match the raw bytes and convert just the digits kept
+        match = pattern.search(value)
+        if match:
+            return unicode(match.group(1))
+
+    value = Unicode._to_python(validator, value)
+
+    match = pattern.search(value)
+    if not match:
+        raise ValidationException(message, message_args=(value,))
+    return match.groups()[0]
+
+
 class ZipCode5(Unicode):
     """
 
@@ -748,19 +1814,15 @@ class ZipCode5(Unicode):
     ...
     ValidationException: Please enter ZipCode as a 5 digit number - [o2115]
     """
+    __slots__ = ()
 
-    _zipcode5 = re.compile(r'^(\d\d\d\d\d)', re.I)
+    _zipcode5 = _LazyRegex('_zipcode5', r'^(\d\d\d\d\d)', re.I)
 
     def __init__(self, max_length=5, truncate=False):
         Unicode.__init__(self, max_length=max_length, truncate=truncate)
 
     def _to_python(self, value):
-        value = Unicode._to_python(self, value)
-
-        match = self._zipcode5.search(value)
-        if not match:
-            raise ValidationException('Please enter zip code as a 5 digit number - [%s]' % value)
-        return match.groups()[0]
+        return _match_digits(self, self._zipcode5, 'Please enter zip code as a 5 digit number - [%s]', value)
 
 
 class ZipCodeExt(Unicode):
@@ -782,19 +1844,15 @@ class ZipCodeExt(Unicode):
     ...
     ValidationException: Please enter ZipCodeExt as a 4 digit number - [o123]
     """
+    __slots__ = ()
 
-    _zipcodeext = re.compile(r'^(\d\d\d\d)', re.I)
+    _zipcodeext = _LazyRegex('_zipcodeext', r'^(\d\d\d\d)', re.I)
 
     def __init__(self, max_length=4, truncate=False):
         Unicode.__init__(self, max_length=max_length, truncate=truncate)
 
     def _to_python(self, value):
-        value = Unicode._to_python(self, value)
-
-        match = self._zipcodeext.search(value)
-        if not match:
-            raise ValidationException('Please enter ZipCodeExt as a 4 digit number - [%s]' % value)
-        return match.groups()[0]
+        return _match_digits(self, self._zipcodeext, 'Please enter ZipCodeExt as a 4 digit number - [%s]', value)
 
 
 class PhoneExt(Unicode):
@@ -814,19 +1872,15 @@ class PhoneExt(Unicode):
     >>> p.to_python('1234567') # testing too long, should cut off after 6
     u'123456'
     """
+    __slots__ = ()
 
-    _phoneext = re.compile(r'^(\d{1,6})', re.I)
+    _phoneext = _LazyRegex('_phoneext', r'^(\d{1,6})', re.I)
 
     def __init__(self, max_length=6, truncate=False):
         Unicode.__init__(self, max_length=max_length, truncate=truncate)
 
     def _to_python(self, value):
-        value = Unicode._to_python(self, value)
-
-        match = self._phoneext.search(value)
-        if not match:
-            raise ValidationException('Please enter extension as a 1-6 digit number - [%s]' % value)
-        return match.groups()[0]
+        return _match_digits(self, self._phoneext, 'Please enter extension as a 1-6 digit number - [%s]', value)
 
 
 class Percentage(Decimal):
@@ -841,8 +1895,135 @@ class Percentage(Decimal):
     >>> p.to_python('5%')
     Decimal('5.00')
     """
+    __slots__ = ()
 
     def _to_python(self, value):
+        if type(value) in _BUFFER_TYPES:
+            value = _buffer_bytes(value)
         if isinstance(value, basestring):
-            value = re.sub(r"(.*?)( *?% *$)", r'\1', value)
+            # Drop a trailing '%' and the spaces around it.  Not a regex, (.*?)( *?% *$) backtracks
+            # quadratically on long runs of spaces.
+            stripped = value.rstrip(' ')
+            if stripped.endswith('%'):
+                value = stripped[:-1].rstrip(' ')
         return Decimal._to_python(self, value)
+
+
+class Chain(Validator):
+    """Runs value through validators in order, each stage getting the previous stage's result.
+
+    A stage returning None ends the chain with None, from_python is the last
+    stage's.  The stages are compiled into a single generated function when the
+    chain is constructed: nested Chains are spliced in, and once a stage has
+    produced stripped unicode (Strip, Email, PhoneNumber, ZipCode5, ZipCodeExt,
+    PhoneExt) the following Unicode based stages skip the conversion, strip and
+    emptiness check they would otherwise repeat.
+
+    >>> c = Chain(Unicode(max_length=255), Strip(), Email())
+    >>> c.to_python('  glen@openmile.com ')
+    u'glen@openmile.com'
+    >>> c.to_python('   ') is None
+    True
+    >>> Chain(Strip(), Unicode(max_length=3)).to_python(' abcd ')
+    Traceback (most recent call last):
+    ...
+    MaxLengthException: Please enter a string no more than 3 characters
+    >>> Chain(c, Enum(['glen@openmile.com'])).validators == c.validators + (Enum(['glen@openmile.com']),)
+    True
+    """
+    __slots__ = ('validators', '_chain')
+
+    def __init__(self, *validators):
+        stages = []
+        for validator in validators:
+            if isinstance(validator, Chain):
+                stages.extend(validator.validators)
+            else:
+                stages.append(validator)
+        if not stages:
+            raise ValueError('Chain needs at least one validator')
+        object.__setattr__(self, 'validators', tuple(stages))
+        object.__setattr__(self, '_chain', self._compile())
+
+    def __getstate__(self):
+        state = Validator.__getstate__(self)
+        state.pop('_chain', None)
+        return state
+
+    def __setstate__(self, state):
+        Validator.__setstate__(self, state)
+        object.__setattr__(self, '_chain', self._compile())
+
+    def is_empty(self, value):
+        return self.validators[0].is_empty(value)
+
+    def to_python(self, value):
+        if instrument.active:
+            # Through each stage's own (instrumented) to_python, what the compiled chain is equivalent to
+            for validator in self.validators:
+                value = validator.to_python(value)
+                if value is None:
+                    return None
+            return value
+        return self._chain(value)
+
+    def _from_python(self, value):
+        return self.validators[-1].from_python(value)
+
+    def _compile(self):
+        namespace = {'buffer_types': _BUFFER_TYPES, 'buffer_bytes': _buffer_bytes, 'is_blank': _is_blank}
+        lines = ['def to_python(value):']
+        # What the previous stages guarantee about value: None (nothing), 'unicode' or 'stripped' (non empty, stripped unicode)
+        state = None
+        last = len(self.validators) - 1
+        for i, validator in enumerate(self.validators):
+            kind = type(validator)
+            if kind is Strip or kind is Unicode:
+                if state is None:
+                    lines.append('    if is_blank(value):')
+                    lines.append('        return None')
+                    lines.append('    if not isinstance(value, unicode):')
+                    lines.append('        if type(value) in buffer_types:')
+                    lines.append('            value = buffer_bytes(value)')
+                    lines.append('        value = unicode(value, errors=\'ignore\') if isinstance(value, str) else unicode(value)')
+                elif state == 'unicode' and kind is Unicode:
+                    lines.append('    if not value.strip():')
+                    lines.append('        return None')
+
+                if kind is Unicode:
+                    namespace['validate_%d' % i] = validator._validate
+                    lines.append('    value = validate_%d(value)' % i)
+                    state = state or 'unicode'
+                elif state != 'stripped':
+                    lines.append('    value = value.strip()')
+                    if i != last or state == 'unicode':
+                        # An empty string is empty to every following stage, and to Strip itself after a conversion
+                        lines.append('    if not value:')
+                        lines.append('        return None')
+                    state = 'stripped'
+                continue
+
+            if state == 'stripped' and isinstance(validator, Unicode) and _inherits(validator, Validator, 'to_python', 'is_empty'):
+                # Already converted, stripped and non empty, only the stage's own parsing and length checks are left
+                namespace['to_python_%d' % i] = validator._to_python
+                namespace['validate_%d' % i] = validator._validate
+                lines.append('    value = validate_%d(to_python_%d(value))' % (i, i))
+            else:
+                namespace['to_python_%d' % i] = validator.to_python
+                lines.append('    value = to_python_%d(value)' % i)
+                if i != last:
+                    lines.append('    if value is None:')
+                    lines.append('        return None')
+            state = 'stripped' if kind in _STRIPPED_OUTPUT else None
+        lines.append('    return value')
+
+        exec '\n'.join(lines) in namespace
+        return namespace['to_python']
+
+
+# Validators whose non empty results are always stripped unicode
+_STRIPPED_OUTPUT = frozenset([Strip, Email, PhoneNumber, ZipCode5, ZipCodeExt, PhoneExt])
+
+
+from schema import *
+import instrument
@@ -0,0 +1,154 @@
+import collections
+import copy
+import decimal
+import threading
+
+from datetime import datetime, date, time
+
+from exception import ValidationException
+
+__all__ = ['LRUCache', 'CachedValidator']
+
+# Types where equal values always produce equal results, used as cache keys directly
+_EXACT_TYPES = frozenset([str, unicode, int, long, bool, type(None), date])
+# Types where equal values can still differ (-0.0, Decimal('1.0') vs Decimal('1.00'), timezones), keyed by repr
+_REPR_TYPES = frozenset([float, decimal.Decimal, datetime, time])
+
+_missing = object()
+
+
+def _config_key(validator):
+    # Validators hash and compare by configuration
+    try:
+        hash(validator)
+    except TypeError:
+        # Unhashable configuration, only share entries with this exact instance
+        return (type(validator), id(validator))
+    return validator
+
+
+class LRUCache(object):
+    """Thread safe, size bounded least recently used cache with hit/miss counters.
+
+    >>> c = LRUCache(maxsize=2)
+    >>> c.put('a', 1); c.put('b', 2); c.get('a'); c.put('c', 3)
+    1
+    >>> c.get('b') is None
+    True
+    >>> sorted(c.info().items())
+    [('hits', 1), ('maxsize', 2), ('misses', 1), ('size', 2)]
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'maxsize': self.maxsize}
+
+    def __setstate__(self, state):
+        self.__init__(state['maxsize'])
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.pop(key, _missing)
+            if value is _missing:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize}
+
+
+class CachedValidator(object):
+    """Memoizes a validator's to_python results, including raised ValidationExceptions.
+
+    Entries are keyed on the validator's configuration and the input value, so
+    validators with the same configuration can share a cache.  Only immutable
+    scalar inputs (strings, numbers, dates) are cached, anything else is passed
+    straight through.
+
+    >>> from validation21 import Integer
+    >>> cache = LRUCache(maxsize=100)
+    >>> i = CachedValidator(Integer(max=10), cache)
+    >>> i.to_python('5'), i.to_python('5'), CachedValidator(Integer(max=10), cache).to_python('5')
+    (5, 5, 5)
+    >>> i.to_python('c')
+    Traceback (most recent call last):
+    ...
+    ValidationException: Please enter an integer - [c]
+    >>> sorted(cache.info().items())
+    [('hits', 2), ('maxsize', 100), ('misses', 2), ('size', 2)]
+    """
+
+    def __init__(self, validator, cache=None, maxsize=1024):
+        self.validator = validator
+        self.cache = cache if cache is not None else LRUCache(maxsize)
+        self._key = _config_key(validator)
+
+    def is_empty(self, value):
+        return self.validator.is_empty(value)
+
+    def from_python(self, value):
+        return self.validator.from_python(value)
+
+    def from_python_many(self, values):
+        return self.validator.from_python_many(values)
+
+    def to_python(self, value):
+        value_type = type(value)
+        if value_type in _EXACT_TYPES:
+            key = (self._key, value_type, value)
+        elif value_type in _REPR_TYPES:
+            key = (self._key, value_type, repr(value))
+        else:
+            return self.validator.to_python(value)
+
+        entry = self.cache.get(key, _missing)
+        if entry is _missing:
+            try:
+                entry = (True, self.validator.to_python(value))
+            except ValidationException, e:
+                entry = (False, e)
+            self.cache.put(key, entry)
+
+        ok, result = entry
+        if ok:
+            return result
+        # Callers may annotate the exception (field, table), never hand out the cached instance
+        raise copy.copy(result)
+
+    def to_python_many(self, values):
+        results = []
+        errors = {}
+        append = results.append
+        to_python = self.to_python
+        for i, value in enumerate(values):
+            try:
+                append(to_python(value))
+            except ValidationException, e:
+                errors[i] = e
+                append(None)
+        return results, errors
@@ -0,0 +1,273 @@
+"""Validates a sequence of values straight into a NumPy array.
+
+to_array(validator, values) returns (array, mask, errors) for an Integer,
+Decimal, Date or Boolean validator (or a subclass):
+
+    array   int64, int64 scaled by 10 ** scale (float64 with scaled=False),
+            datetime64[D] or bool, 0 / NaN / NaT / False where mask is False
+    mask    bool array, True where the value was valid and not empty
+    errors  {index: ValidationException} like to_python_many
+
+Integer and Decimal parse into int64 without building a result object per
+value and apply min/max as array comparisons, a column of plain str integers
+is parsed by numpy in one call and plain decimal strings never become
+decimal.Decimal.  Values that don't fit in an int64 (after scaling) are
+errors.  Subclasses that change how values are parsed (Type, ObjectID,
+Currency, ...) go through their to_python_many and the results are copied
+into the array.  numpy is only imported when to_array is called.
+
+>>> from validation21 import Integer, Decimal, Date
+>>> array, mask, errors = to_array(Integer(max=10), ['1', '', 'c', '11', 7])
+>>> array.tolist(), mask.tolist(), sorted((i, str(e)) for i, e in errors.items())
+([1, 0, 0, 0, 7], [True, False, False, False, True], [(2, 'Please enter an integer - [c]'), (3, 'Value must not be greater than 10')])
+>>> to_array(Integer(), ['1L', '2'])[2].keys()
+[0]
+>>> to_array(Decimal(), ['10.01', '1,000', 3])[0].tolist()
+[1001, 100000, 300]
+>>> to_array(Decimal(), ['10.01', 'x'], scaled=False)[0].tolist()
+[10.01, nan]
+>>> array, mask, errors = to_array(Date(), ['12/2/1989', None, '1989-01-02'])
+>>> [str(d) for d in array]
+['1989-12-02', 'NaT', '1989-01-02']
+"""
+import decimal
+
+from datetime import date
+
+from validation21 import Integer, Decimal, Date, Boolean, parse, _fast_datetime, _inherits, _plain_decimal_re, \
+    _is_blank, _BUFFER_TYPES, _buffer_bytes
+from exception import ValidationException
+
+__all__ = ['to_array']
+
+_INT64_MIN = -2 ** 63
+_INT64_MAX = 2 ** 63 - 1
+
+# datetime64[D] counts days from 1970-01-01, NaT is the smallest int64
+_EPOCH_ORDINAL = 719163
+_NAT = _INT64_MIN
+
+_STR_ONLY = set([str])
+_LONG_SUFFIX = frozenset('lL')
+
+
+def to_array(validator, values, scaled=True):
+    '''Returns (array, mask, errors) for values, see the module docstring.
+
+    scaled only applies to Decimal validators, False returns float64 instead of
+    int64 counting units of 10 ** -scale.
+    '''
+    # Only needed here, importing validation21 shouldn't pay for numpy
+    import numpy
+
+    values = list(values)
+    count = len(values)
+    valid = [False] * count
+    errors = {}
+
+    if isinstance(validator, Boolean):
+        results, errors = validator.to_python_many(values)
+        array = numpy.fromiter((bool(r) for r in results), numpy.bool_, count)
+        mask = numpy.fromiter((r is not None for r in results), numpy.bool_, count)
+        return array, mask, errors
+
+    if isinstance(validator, Integer):
+        if _inherits(validator, Integer, 'to_python', 'is_empty', '_to_python', '_validate'):
+            array = None
+            if set(map(type, values)) == _STR_ONLY and not _LONG_SUFFIX.intersection(''.join(values)):
+                # numpy parses the whole column like int(), anything it rejects (blanks, commas, overflow) takes the slow path.
+                # It also accepts long literals ('1L') which int() doesn't, those take the slow path too
+                try:
+                    array = numpy.array(values, dtype=numpy.int64)
+                    mask = numpy.ones(count, dtype=numpy.bool_)
+                except (ValueError, OverflowError):
+                    pass
+            if array is None:
+                array = numpy.array(_parse_integers(validator, values, valid, errors), dtype=numpy.int64)
+                mask = numpy.array(valid, dtype=numpy.bool_)
+            _apply_bounds(numpy, array, mask, errors, validator.min, validator.max, 0,
+                          'Values must not be less than %d', 'Value must not be greater than %d')
+        else:
+            array, mask = _from_results(numpy, validator, values, valid, errors, int, 0)
+        return array, mask, errors
+
+    if isinstance(validator, Decimal):
+        if _inherits(validator, Decimal, 'to_python', 'is_empty', '_to_python', '_validate', '_parse', '_check_bounds'):
+            array = numpy.array(_parse_decimals(validator, values, valid, errors), dtype=numpy.int64)
+            mask = numpy.array(valid, dtype=numpy.bool_)
+            # Integers below a fractional bound are below its ceiling, above it above its floor
+            low = None if validator._min is None else _scaled(validator._min, validator.scale, decimal.ROUND_CEILING)
+            high = None if validator._max is None else _scaled(validator._max, validator.scale, decimal.ROUND_FLOOR)
+            _apply_bounds(numpy, array, mask, errors, low, high, 0,
+                          'Value must not be less than %d', 'Value must not be greater than %d', validator.min, validator.max)
+        else:
+            array, mask = _from_results(numpy, validator, values, valid, errors,
+                                        lambda r: int(r.scaleb(validator.scale)), 0)
+        if not scaled:
+            array = array / float(10 ** validator.scale)
+            array[~mask] = numpy.nan
+        return array, mask, errors
+
+    if isinstance(validator, Date):
+        if _inherits(validator, Date, 'to_python', 'is_empty', '_to_python', '_validate'):
+            days = numpy.array(_parse_dates(values, valid, errors), dtype=numpy.int64)
+            mask = numpy.array(valid, dtype=numpy.bool_)
+        else:
+            days, mask = _from_results(numpy, validator, values, valid, errors,
+                                       lambda r: r.toordinal() - _EPOCH_ORDINAL, _NAT)
+        return days.view('datetime64[D]'), mask, errors
+
+    raise TypeError('to_array supports Integer, Decimal, Date and Boolean validators, not %s' % type(validator).__name__)
+
+
+def _out_of_range(value):
+    return ValidationException('Value is out of range - [%s]', message_args=(value,))
+
+
+def _parse_integers(validator, values, valid, errors):
+    '''Each value as an int like Integer._to_python without the bounds, 0 where it is empty or invalid'''
+    items = [0] * len(values)
+    for i, value in enumerate(values):
+        if type(value) in _BUFFER_TYPES:
+            value = _buffer_bytes(value)
+        if value is None:
+            continue
+        if isinstance(value, basestring):
+            if not value.strip():
+                continue
+            value = value.replace(',', '')
+
+        try:
+            value = int(value)
+        except ValueError:
+            errors[i] = ValidationException('Please enter an integer - [%s]', message_args=(value,))
+            continue
+
+        if _INT64_MIN <= value <= _INT64_MAX:
+            valid[i] = True
+            items[i] = value
+            continue
+
+        # Doesn't fit, report the validator's own bounds if it breaks them
+        try:
+            Integer._to_python(validator, value)
+        except ValidationException, e:
+            errors[i] = e
+        else:
+            errors[i] = _out_of_range(value)
+    return items
+
+
+def _parse_decimals(validator, values, valid, errors):
+    '''Each value as an int counting units of 10 ** -scale, 0 where it is empty or invalid'''
+    items = [0] * len(values)
+    scale = validator.scale
+    factor = 10 ** scale
+    parse_decimal = validator._parse
+    match = _plain_decimal_re.match
+    for i, value in enumerate(values):
+        if _is_blank(value):
+            continue
+        if type(value) in _BUFFER_TYPES:
+            value = _buffer_bytes(value)
+
+        result = None
+        if isinstance(value, basestring):
+            m = match(value.replace(',', '').strip())
+            if m is not None:
+                sign, whole, fraction = m.groups()
+                fraction = fraction or ''
+                if (whole or fraction) and len(fraction) <= scale:
+                    # Exact at this scale, the digits are the scaled integer
+                    result = int('%s%s%s' % (sign, whole, fraction.ljust(scale, '0')))
+        elif isinstance(value, (int, long)):
+            result = value * factor
+
+        if result is None:
+            number = parse_decimal(value)
+            if number is None:
+                if isinstance(value, basestring):
+                    value = value.replace(',', '')
+                errors[i] = ValidationException('Please enter a number - [%s]', message_args=(value,))
+                continue
+            result = int(number.scaleb(scale))
+
+        if _INT64_MIN <= result <= _INT64_MAX:
+            valid[i] = True
+            items[i] = result
+            continue
+
+        try:
+            validator._check_bounds(decimal.Decimal(result).scaleb(-scale, context=validator._context))
+        except ValidationException, e:
+            errors[i] = e
+        else:
+            errors[i] = _out_of_range(value)
+    return items
+
+
+def _parse_dates(values, valid, errors):
+    '''Each value as days since 1970-01-01 like Date._to_python, NaT where it is empty or invalid'''
+    items = [_NAT] * len(values)
+    for i, value in enumerate(values):
+        if _is_blank(value):
+            continue
+
+        if isinstance(value, date):
+            result = value
+        else:
+            value = str(value)
+            try:
+                result = _fast_datetime(value) or parse(value)
+            except (ValueError, OverflowError), e:
+                errors[i] = ValidationException(e.message)
+                continue
+            if result.year < 1900:
+                errors[i] = ValidationException('Year must be after 1900')
+                continue
+
+        valid[i] = True
+        items[i] = result.toordinal() - _EPOCH_ORDINAL
+    return items
+
+
+def _from_results(numpy, validator, values, valid, errors, convert, empty):
+    '''(array, mask) holding convert(result) for each result of validator.to_python_many'''
+    results, many_errors = validator.to_python_many(values)
+    errors.update(many_errors)
+
+    items = [empty] * len(results)
+    for i, result in enumerate(results):
+        if result is None:
+            continue
+        result = convert(result)
+        if _INT64_MIN <= result <= _INT64_MAX:
+            valid[i] = True
+            items[i] = result
+        else:
+            errors[i] = _out_of_range(values[i])
+    return numpy.array(items, dtype=numpy.int64), numpy.array(valid, dtype=numpy.bool_)
+
+
+def _scaled(bound, scale, rounding):
+    return int(bound.scaleb(scale).to_integral_value(rounding=rounding))
+
+
+def _apply_bounds(numpy, array, mask, errors, low, high, fill, low_message, high_message, low_arg=None, high_arg=None):
+    '''Reports and masks the valid entries below low or above high, checking low first like the validators do'''
+    for bound, message, arg, compare in ((low, low_message, low_arg, numpy.less), (high, high_message, high_arg, numpy.greater)):
+        if bound is None:
+            continue
+        if _INT64_MIN <= bound <= _INT64_MAX:
+            outside = mask & compare(array, bound)
+        elif compare(0, bound):
+            # A bound an int64 can't hold is on the same side of every value in the column
+            outside = mask.copy()
+        else:
+            continue
+        if outside.any():
+            arg = bound if arg is None else arg
+            for i in numpy.flatnonzero(outside):
+                errors[int(i)] = ValidationException(message, message_args=(arg,))
+            mask &= ~outside
+            array[outside] = fill
@@ -1,34 +1,168 @@
-import hashlib
-import thread
+import contextlib
+import threading
 
-__all__ = ['ValidationException', 'ValidationWarningException', 'MinLengthException', 'MaxLengthException']
+__all__ = ['ValidationException', 'ValidationWarningException', 'MinLengthException', 'MaxLengthException', 'Invalid']
+
+# Warning keys by (warning_level, name, value, type(value), message), cleared when it reaches _WARNING_KEY_CACHE_SIZE
+_warning_keys = {}
+_WARNING_KEY_CACHE_SIZE = 10000
+
+
+def _hash_warning(warning_level, name, value, message):
+    # hashlib is only needed once a warning key is asked for, keep it off the import path
+    import hashlib
+    return hashlib.sha1(('%s-%s-%s-%s' % (warning_level, name, value, message)).encode('utf-8')).hexdigest()
+
+
+def _warning_key(warning_level, name, value, message):
+    parts = (warning_level, name, value, type(value), message)
+    try:
+        key = _warning_keys.get(parts)
+    except TypeError:
+        # Unhashable value, nothing to share
+        return _hash_warning(warning_level, name, value, message)
+
+    if key is None:
+        key = _hash_warning(warning_level, name, value, message)
+        if len(_warning_keys) >= _WARNING_KEY_CACHE_SIZE:
+            _warning_keys.clear()
+        _warning_keys[parts] = key
+    return key
+
+
+# The arguments as passed to the constructor, ValidationException.args renders the template
+_raw_args = BaseException.args.__get__
+_set_raw_args = BaseException.args.__set__
 
 
 class ValidationException(ValueError):
+    """
+    The message may be a template, formatted with message_args only when the
+    exception is displayed or args/message are read.  The rendered message is
+    cached, so error_dict shouldn't be changed once the exception has been
+    converted to a string.
+
+    >>> e = ValidationException('Please enter an integer - [%s]', message_args=('c',))
+    >>> e
+    ValidationException('Please enter an integer - [c]',)
+    >>> str(e), unicode(e)
+    ('Please enter an integer - [c]', u'Please enter an integer - [c]')
+    >>> e.message, e.args, e[0], e[:1]
+    ('Please enter an integer - [c]', ('Please enter an integer - [c]',), 'Please enter an integer - [c]', ('Please enter an integer - [c]',))
+    >>> str(ValidationException(error_dict={'id': e}, table='people'))
+    'unknown.id: Please enter an integer - [c]'
+    """
     WARNING_LEVEL_USER = 0
     WARNING_LEVEL_INTERNAL = 1
 
+    # Defaults for the keyword arguments, only the ones passed are stored on the instance
+    error_dict = None
+    field = 'unknown'
+    table = 'unknown'
+    form_name = None
+    warning_level = None
+    warning_ignored = False
+    message_args = None
+    _rendered = None
+    _warning_key = None
+    _warning_parts = None
+    _options = frozenset(['error_dict', 'field', 'table', 'form_name', 'warning_level', 'warning_key', 'message_args'])
+
     def __init__(self, *args, **kwargs):
-        self.error_dict = kwargs.pop('error_dict', None)
-        self.field = kwargs.pop('field', 'unknown') or 'unknown'
-        self.table = kwargs.pop('table', 'unknown') or 'unknown'
-        self.form_name = kwargs.pop('form_name', None)
-        self.warning_level = kwargs.pop('warning_level', None)
-        self.warning_key = kwargs.pop('warning_key', None)
-        self.warning_ignored = False
-        ValueError.__init__(self, *args, **kwargs)
+        if kwargs:
+            if 'field' in kwargs:
+                kwargs['field'] = kwargs['field'] or 'unknown'
+            if 'table' in kwargs:
+                kwargs['table'] = kwargs['table'] or 'unknown'
+            if not self._options.issuperset(kwargs):
+                raise TypeError('%s does not take keyword arguments %s' % (type(self).__name__, ', '.join(sorted(set(kwargs) - self._options))))
+            if 'warning_key' in kwargs:
+                kwargs['_warning_key'] = kwargs.pop('warning_key')
+            self.__dict__.update(kwargs)
+        ValueError.__init__(self, *args)
+
+    def _render(self):
+        if self._rendered is None:
+            if self.error_dict is not None:
+                self._rendered = u', '.join([u'{}.{}: {}'.format(y.table, x, y) for x, y in self.error_dict.items()])
+            else:
+                self._rendered = _raw_args(self)[0] % self.message_args
+        return self._rendered
+
+    @property
+    def args(self):
+        args = _raw_args(self)
+        if self.message_args is None or not args:
+            return args
+        return (self._render(),) + args[1:]
+
+    @args.setter
+    def args(self, args):
+        _set_raw_args(self, args)
+        self._rendered = None
+
+    @property
+    def message(self):
+        if self.message_args is None:
+            args = _raw_args(self)
+            return args[0] if len(args) == 1 else ''
+        return self._render()
+
+    @message.setter
+    def message(self, message):
+        self.args = (message,)
+        self.message_args = None
+
+    # e[0] and e[:1] read BaseException's stored args, index the rendered ones instead
+    def __getitem__(self, index):
+        return self.args[index]
+
+    def __getslice__(self, start, stop):
+        return self.args[start:stop]
 
     def __str__(self):
-        if self.error_dict is not None:
-            return (u', '.join([u'{}.{}: {}'.format(y.table, x, y) for x, y in self.error_dict.items()])).encode('utf-8')
-        return ValueError.__str__(self)
+        if self.error_dict is None and self.message_args is None:
+            return ValueError.__str__(self)
+        rendered = self._render()
+        if isinstance(rendered, unicode):
+            return rendered.encode('utf-8')
+        return rendered
+
+    def __unicode__(self):
+        if self.error_dict is None and self.message_args is None:
+            return ValueError.__unicode__(self)
+        rendered = self._render()
+        if isinstance(rendered, str):
+            return rendered.decode('utf-8', 'replace')
+        return rendered
+
+    def __repr__(self):
+        if self.message_args is None:
+            return ValueError.__repr__(self)
+        return '%s%r' % (type(self).__name__, self.args)
+
+    @property
+    def warning_key(self):
+        '''Identifies a warning in om_ignore, hashed on first access for warnings from create_warning'''
+        key = self._warning_key
+        if key is None and self._warning_parts is not None:
+            warning_level, name, value = self._warning_parts
+            message = _raw_args(self)[0] if self.message_args is None else self._render()
+            key = self._warning_key = _warning_key(warning_level, name, value, message)
+        return key
+
+    @warning_key.setter
+    def warning_key(self, key):
+        self._warning_key = key
 
     @classmethod
     def create_warning(cls, warning_level, name, value, *args, **kwargs):
         kwargs['warning_level'] = warning_level
+        kwargs.pop('warning_key', None)
 
-        kwargs['warning_key'] = hashlib.sha1(('%s-%s-%s-%s' % (warning_level, name, value, args[0])).encode('utf-8')).hexdigest()
-        return ValidationException(*args, **kwargs)
+        e = ValidationException(*args, **kwargs)
+        e._warning_parts = (warning_level, name, value)
+        return e
 
     @staticmethod
     def merge_errors(errors, e, prefix=None):
@@ -50,7 +184,25 @@ class ValidationException(ValueError):
 
     @classmethod
     def handle_warnings(cls, errors, values):
-        return {k: v for (k, v) in [(k, v.handle_warning(values)) for (k, v) in errors.items()] if not hasattr(v, 'warning_ignored') or not v.warning_ignored}
+        '''Returns a copy of errors without the warnings the user chose to ignore (om_ignore in values).
+
+        Unlike handle_warning the exceptions aren't modified, and warning keys are
+        only computed when there is something to ignore.
+
+        >>> import hashlib
+        >>> w = ValidationException.create_warning(ValidationException.WARNING_LEVEL_USER, 'weight', 90000, 'Weight is unusually high')
+        >>> w.warning_key == hashlib.sha1('0-weight-90000-Weight is unusually high').hexdigest()
+        True
+        >>> errors = {'weight': w, 'id': ValidationException('Please enter an integer - [c]')}
+        >>> sorted(ValidationException.handle_warnings(errors, {'om_ignore': {w.warning_key: True}}))
+        ['id']
+        >>> sorted(ValidationException.handle_warnings(errors, {}))
+        ['id', 'weight']
+        '''
+        ignore = values['om_ignore'] if 'om_ignore' in values else None
+        if not ignore:
+            return dict(errors)
+        return dict((k, v) for k, v in errors.items() if not ignore.get(v.warning_key, False))
 
     def handle_warning(self, values):
         self.warning_ignored = 'om_ignore' in values and values['om_ignore'].get(self.warning_key, False)
@@ -61,20 +213,62 @@ class ValidationException(ValueError):
 
 
 class ValidationWarningException(ValidationException):
-    overrides = {}
+    """
+    Overrides are the warning keys the current request asked to ignore.  They
+    are kept in a threading.local (greenlet local once gevent has patched
+    threading), so concurrent requests never see each other's keys and they are
+    dropped along with the thread.  override_scope() removes the keys it
+    registered when the block exits.
+
+    >>> with ValidationWarningException.override_scope(['abc']):
+    ...     ValidationWarningException.has_override('abc')
+    True
+    >>> ValidationWarningException.has_override('abc')
+    False
+    """
+    _local = threading.local()
+
+    @classmethod
+    def _overrides(cls):
+        try:
+            return cls._local.overrides
+        except AttributeError:
+            overrides = cls._local.overrides = {}
+            return overrides
 
     @classmethod
     def register_overrides(cls, keys):
-        tid = thread.get_ident()
-        if tid not in cls.overrides:
-            cls.overrides[tid] = {}
+        overrides = cls._overrides()
+        for k in keys:
+            overrides[k] = overrides.get(k, 0) + 1
 
+    @classmethod
+    def unregister_overrides(cls, keys):
+        overrides = cls._overrides()
         for k in keys:
-            cls.overrides[tid][k] = True
+            count = overrides.get(k, 0) - 1
+            if count > 0:
+                overrides[k] = count
+            else:
+                overrides.pop(k, None)
+
+    @classmethod
+    @contextlib.contextmanager
+    def override_scope(cls, keys):
+        keys = list(keys)
+        cls.register_overrides(keys)
+        try:
+            yield
+        finally:
+            cls.unregister_overrides(keys)
 
     @classmethod
     def has_override(cls, key):
-        pass
+        return key in cls._overrides()
+
+    @classmethod
+    def clear_overrides(cls):
+        cls._local.overrides = {}
 
 
 class MinLengthException(ValidationException):
@@ -83,3 +277,35 @@ class MinLengthException(ValidationException):
 
 class MaxLengthException(ValidationException):
     pass
+
+
+class Invalid(object):
+    """Lightweight description of a rejected value, returned by Validator.check instead of raising.
+
+    The ValidationException is only built when exception() is called.
+    """
+    __slots__ = ('message', 'message_args', 'exception_class', '_exception')
+
+    def __init__(self, message, message_args=None, exception_class=ValidationException, exception=None):
+        self.message = message
+        self.message_args = message_args
+        self.exception_class = exception_class
+        self._exception = exception
+
+    @classmethod
+    def from_exception(cls, e):
+        args = _raw_args(e)
+        return cls(args[0] if args else '', e.message_args, type(e), e)
+
+    def exception(self):
+        if self._exception is not None:
+            return self._exception
+        return self.exception_class(self.message, message_args=self.message_args)
+
+    def __str__(self):
+        return str(self.exception())
+
+    def __repr__(self):
+        if self.message_args is None:
+            return 'Invalid(%r)' % (self.message,)
+        return 'Invalid(%r)' % (self.message % self.message_args,)
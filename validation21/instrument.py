@@ -0,0 +1,274 @@
+"""Opt-in timing and failure counters for validators.
+
+enable() wraps to_python, from_python, _check and to_python_many on Validator
+and every subclass that overrides them, disable() puts the original methods
+back so there is no cost while instrumentation is off.  Classes defined after
+enable() are only covered if they inherit these methods.
+
+Stats are kept per class and method: 'to_python', 'from_python', 'check' (the
+native _check behind check(), check_many() and compiled Schemas) and
+'to_python_many', which counts each value of a batch as a call.  Calls a
+validator makes on itself while one of its calls is being recorded (a batch
+running _check, a to_python delegating to Validator.to_python) are not counted
+again.  While enabled, Schemas and Chains run their fields and stages through
+these methods instead of their compiled fast paths.
+
+With enable(fields=True) every Schema also records per field stats, keyed by
+'table.field' ('unknown.field' for schemas without a table).
+
+>>> from validation21 import Integer, Schema
+>>> enable(fields=True)
+>>> i = Integer(max=10)
+>>> i.to_python('5'), i.to_python(''), i.from_python(5)
+(5, None, '5')
+>>> i.to_python('c')
+Traceback (most recent call last):
+...
+ValidationException: Please enter an integer - [c]
+>>> Schema({'id': Integer()}, table='people').validate({'id': 'x'})[1].keys()
+['id']
+>>> stats = snapshot()
+>>> [(k, stats['validators']['Integer']['to_python'][k]) for k in ('calls', 'empty', 'failures')]
+[('calls', 3), ('empty', 1), ('failures', 1)]
+>>> stats['fields']['people.id']['failures']
+1
+>>> disable(); reset()
+>>> snapshot()
+{'fields': {}, 'validators': {}}
+>>> from validation21 import Date, Email
+>>> s = Schema({'d': Date(), 'e': Email(), 'i': Integer()})
+>>> enable()
+>>> s.validate({'d': '12/2/1989', 'e': 'a@openmile.com', 'i': 'c'})[1].keys()
+['i']
+>>> Integer().to_python_many(['1', '', 'c'])[1].keys()
+[2]
+>>> stats = snapshot()['validators']
+>>> sorted((name, sorted(stats[name])) for name in stats)
+[('Date', ['to_python']), ('Email', ['check']), ('Integer', ['check', 'to_python_many'])]
+>>> [stats['Integer']['to_python_many'][k] for k in ('calls', 'empty', 'failures')]
+[3, 1, 1]
+>>> disable(); reset()
+"""
+import bisect
+import threading
+import timeit
+
+from validation21 import Validator
+from exception import ValidationException
+
+__all__ = ['enable', 'disable', 'enabled', 'snapshot', 'reset', 'BUCKETS']
+
+# Upper bounds of the latency histogram buckets in microseconds, slower calls land in a final overflow bucket
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 50000, 100000)
+
+# Checked by Schema and Chain on every call, True while enabled
+active = False
+# True while per field stats are being recorded
+fields_enabled = False
+
+_timer = timeit.default_timer
+_lock = threading.Lock()
+_validators = {}
+_fields = {}
+_patched = []
+
+
+class _Recording(threading.local):
+    def __init__(self):
+        # ids of the validators with a call being recorded in this thread
+        self.ids = set()
+
+
+_recording = _Recording()
+
+
+class _Stats(object):
+    def __init__(self):
+        self.calls = 0
+        self.empty = 0
+        self.failures = 0
+        self.seconds = 0.0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'empty': self.empty,
+            'failures': self.failures,
+            'total_seconds': self.seconds,
+            'histogram_us': zip(BUCKETS + ('+Inf',), self.histogram),
+        }
+
+
+def _record(table, key, elapsed, failed, empty):
+    with _lock:
+        stats = table.get(key)
+        if stats is None:
+            stats = table[key] = _Stats()
+        stats.calls += 1
+        stats.seconds += elapsed
+        stats.histogram[bisect.bisect_left(BUCKETS, elapsed * 1e6)] += 1
+        if failed:
+            stats.failures += 1
+        elif empty:
+            stats.empty += 1
+
+
+def _record_many(table, key, elapsed, count, failures, empty):
+    with _lock:
+        stats = table.get(key)
+        if stats is None:
+            stats = table[key] = _Stats()
+        stats.calls += count
+        stats.seconds += elapsed
+        if count:
+            # The histogram gets the average time per value
+            stats.histogram[bisect.bisect_left(BUCKETS, elapsed * 1e6 / count)] += count
+        stats.failures += failures
+        stats.empty += empty
+
+
+def _record_field(key, elapsed, failed, empty):
+    if fields_enabled:
+        _record(_fields, key, elapsed, failed, empty)
+
+
+def _wrap_to_python(func):
+    def to_python(self, value):
+        ids = _recording.ids
+        if not active or id(self) in ids:
+            return func(self, value)
+        ids.add(id(self))
+        start = _timer()
+        try:
+            result = func(self, value)
+        except ValidationException:
+            _record(_validators, (type(self).__name__, 'to_python'), _timer() - start, True, False)
+            raise
+        finally:
+            ids.discard(id(self))
+        elapsed = _timer() - start
+        _record(_validators, (type(self).__name__, 'to_python'), elapsed, False, result is None and self.is_empty(value))
+        return result
+    return to_python
+
+
+def _wrap_from_python(func):
+    def from_python(self, value):
+        ids = _recording.ids
+        if not active or id(self) in ids:
+            return func(self, value)
+        ids.add(id(self))
+        start = _timer()
+        try:
+            result = func(self, value)
+        except ValidationException:
+            _record(_validators, (type(self).__name__, 'from_python'), _timer() - start, True, False)
+            raise
+        finally:
+            ids.discard(id(self))
+        _record(_validators, (type(self).__name__, 'from_python'), _timer() - start, False, value is None)
+        return result
+    return from_python
+
+
+def _wrap_check(func):
+    def _check(self, value):
+        ids = _recording.ids
+        if not active or id(self) in ids:
+            return func(self, value)
+        ids.add(id(self))
+        start = _timer()
+        try:
+            result, invalid = func(self, value)
+        finally:
+            ids.discard(id(self))
+        elapsed = _timer() - start
+        _record(_validators, (type(self).__name__, 'check'), elapsed, invalid is not None,
+                invalid is None and result is None and self.is_empty(value))
+        return result, invalid
+    return _check
+
+
+def _wrap_to_python_many(func):
+    def to_python_many(self, values):
+        ids = _recording.ids
+        if not active or id(self) in ids:
+            return func(self, values)
+        values = list(values)
+        ids.add(id(self))
+        start = _timer()
+        try:
+            results, errors = func(self, values)
+        finally:
+            ids.discard(id(self))
+        elapsed = _timer() - start
+        is_empty = self.is_empty
+        empty = sum(1 for i, result in enumerate(results) if result is None and i not in errors and is_empty(values[i]))
+        _record_many(_validators, (type(self).__name__, 'to_python_many'), elapsed, len(values), len(errors), empty)
+        return results, errors
+    return to_python_many
+
+
+_WRAPPERS = (('to_python', _wrap_to_python), ('from_python', _wrap_from_python),
+             ('_check', _wrap_check), ('to_python_many', _wrap_to_python_many))
+
+
+def _subclasses(cls):
+    found = [cls]
+    for subclass in cls.__subclasses__():
+        for c in _subclasses(subclass):
+            if c not in found:
+                found.append(c)
+    return found
+
+
+def enabled():
+    return bool(_patched)
+
+
+def enable(fields=False):
+    '''Starts recording, fields=True also records per Schema field stats'''
+    global active, fields_enabled
+    if not _patched:
+        for cls in _subclasses(Validator):
+            for name, wrap in _WRAPPERS:
+                if name in cls.__dict__:
+                    func = cls.__dict__[name]
+                    _patched.append((cls, name, func))
+                    setattr(cls, name, wrap(func))
+    fields_enabled = fields
+    active = True
+
+
+def disable():
+    '''Stops recording and restores the original methods, collected stats are kept'''
+    global active, fields_enabled
+    active = False
+    fields_enabled = False
+    while _patched:
+        cls, name, func = _patched.pop()
+        setattr(cls, name, func)
+
+
+def reset():
+    with _lock:
+        _validators.clear()
+        _fields.clear()
+
+
+def snapshot():
+    '''Returns a copy of the stats as plain dicts:
+
+    {'validators': {class name: {method: stats}},
+     'fields': {'table.field': stats}}
+
+    where stats has calls, empty, failures, total_seconds and histogram_us, a
+    list of (upper bound in microseconds, count) pairs.
+    '''
+    with _lock:
+        validators = {}
+        for (name, method), stats in _validators.items():
+            validators.setdefault(name, {})[method] = stats.as_dict()
+        fields = dict((key, stats.as_dict()) for key, stats in _fields.items())
+    return {'validators': validators, 'fields': fields}
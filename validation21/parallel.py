@@ -0,0 +1,64 @@
+import itertools
+import multiprocessing
+
+__all__ = ['ParallelValidator']
+
+_worker_validator = None
+
+
+def _init_worker(validator):
+    global _worker_validator
+    _worker_validator = validator
+
+
+def _validate_chunk(values):
+    return _worker_validator.to_python_many(values)
+
+
+def _chunks(values, size):
+    values = iter(values)
+    while True:
+        chunk = list(itertools.islice(values, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ParallelValidator(object):
+    """Runs a validator's to_python_many across a pool of worker processes.
+
+    The validator (any Validator or Schema) is pickled once per worker when the
+    pool starts, the input is split into chunks of chunksize values and the
+    results and errors are reassembled in input order.
+
+    >>> from validation21 import Integer
+    >>> with ParallelValidator(Integer(max=10), processes=2, chunksize=2) as p:
+    ...     p.to_python_many(['1', '2', 'c', '4', '11'])
+    ([1, 2, None, 4, None], {2: ValidationException('Please enter an integer - [c]',), 4: ValidationException('Value must not be greater than 10',)})
+    """
+
+    def __init__(self, validator, processes=None, chunksize=10000):
+        self.validator = validator
+        self.chunksize = chunksize
+        self.pool = multiprocessing.Pool(processes, _init_worker, (validator,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def to_python_many(self, values):
+        results = []
+        errors = {}
+        offset = 0
+        for chunk_results, chunk_errors in self.pool.imap(_validate_chunk, _chunks(values, self.chunksize)):
+            for i, e in chunk_errors.items():
+                errors[offset + i] = e
+            results.extend(chunk_results)
+            offset += len(chunk_results)
+        return results, errors
@@ -0,0 +1,356 @@
+import copy
+
+from validation21 import Validator, Integer, ObjectID, _inherits, _native_check, _is_blank
+from exception import ValidationException
+import instrument
+
+__all__ = ['Schema', 'IncrementalSchema']
+
+# Raw inputs that can't change under us, remembered as is, anything else is deep copied
+_IMMUTABLE_TYPES = frozenset([str, unicode, int, long, float, bool, type(None)])
+
+_missing = object()
+
+
+class Schema(Validator):
+    """Validates a whole dict against a mapping of field -> Validator.
+
+    Field validators may be any Validator, a nested Schema or a one item list
+    (e.g. [PhoneNumber()]) for a list of values.  The fields are compiled into
+    a single generated function, errors are keyed by dotted path.
+
+    >>> from validation21 import Integer, Unicode, PhoneNumber, ZipCode5
+    >>> s = Schema({'id': Integer(min=1), 'name': Unicode(max_length=5)})
+    >>> s.to_python({'id': '3', 'name': 'bob'}) == {'id': 3, 'name': u'bob'}
+    True
+    >>> s.to_python({'id': '0', 'name': 'bob'})
+    Traceback (most recent call last):
+    ...
+    ValidationException: unknown.id: Values must not be less than 1
+    >>> s = Schema({'address': Schema({'zip': ZipCode5()}), 'phones': [PhoneNumber()]})
+    >>> result, errors = s.validate({'address': {'zip': 'abc'}, 'phones': ['223-456-7890', 'x']})
+    >>> sorted(errors)
+    ['address.zip', 'phones.1']
+    >>> errors['phones.1'].field
+    '1'
+    >>> Schema({'a': []})
+    Traceback (most recent call last):
+    ...
+    ValueError: List fields must contain exactly one validator: 'a'
+    >>> s = Schema({'owner': ObjectID(resolver=lambda ids: [i for i in ids if i < 5]), 'tags': [Integer()]})
+    >>> results, errors = s.to_python_many([{'owner': '1'}, {'owner': '9'}, {'owner': '2'}])
+    >>> [(i, str(e)) for i, e in errors.items()]
+    [(1, 'unknown.owner: Object does not exist - [9]')]
+    >>> s.validate(None)
+    ({}, {'unknown': ValidationException('Please enter a dictionary - [None]',)})
+    """
+
+    __slots__ = ('fields', 'table', '_validate_dict', '_instrumented_dict', '_reference_fields')
+
+    def __init__(self, fields, table=None):
+        object.__setattr__(self, 'fields', fields)
+        object.__setattr__(self, 'table', table)
+        # Compiled first, it rejects malformed list fields
+        object.__setattr__(self, '_validate_dict', self._compile())
+        object.__setattr__(self, '_instrumented_dict', None)
+        # Fields holding ObjectIDs with a resolver, possibly nested or in lists
+        object.__setattr__(self, '_reference_fields', [(name, validator) for name, validator in fields.items() if _has_references(validator)])
+
+    def __getstate__(self):
+        state = Validator.__getstate__(self)
+        state.pop('_validate_dict', None)
+        state.pop('_instrumented_dict', None)
+        return state
+
+    def __setstate__(self, state):
+        Validator.__setstate__(self, state)
+        object.__setattr__(self, '_validate_dict', self._compile())
+        object.__setattr__(self, '_instrumented_dict', None)
+
+    def validate(self, value):
+        """Returns (result, error_dict) without raising."""
+        if not isinstance(value, dict):
+            return _not_a_dict(value, self.table)
+        if instrument.active:
+            return self._instrumented()(value)
+        return self._validate_dict(value)
+
+    def _to_python(self, value):
+        if not isinstance(value, dict):
+            raise ValidationException('Please enter a dictionary - [%s]', message_args=(value,), table=self.table)
+
+        if instrument.active:
+            result, errors = self._instrumented()(value)
+        else:
+            result, errors = self._validate_dict(value)
+        if errors:
+            raise ValidationException(error_dict=errors, table=self.table)
+        return result
+
+    def to_python_many(self, values):
+        '''Validates a list of dicts, looking up all the ObjectIDs they reference with one resolver call per field'''
+        if not self._reference_fields:
+            return Validator.to_python_many(self, values)
+
+        values = list(values)
+        with ObjectID.batch():
+            pending = {}
+            for value in values:
+                self._collect_references(value, pending)
+            for validator, ids in pending.items():
+                validator.missing(ids)
+            return Validator.to_python_many(self, values)
+
+    def _collect_references(self, data, pending):
+        if not isinstance(data, dict):
+            return
+        for name, validator in self._reference_fields:
+            value = data.get(name)
+            if isinstance(validator, list):
+                if isinstance(value, (list, tuple)):
+                    for item in value:
+                        _collect_reference(validator[0], item, pending)
+            else:
+                _collect_reference(validator, value, pending)
+
+    def _from_python(self, value):
+        if not isinstance(value, dict):
+            return value
+
+        result = {}
+        for name, validator in self.fields.items():
+            v = value.get(name)
+            if isinstance(validator, list):
+                result[name] = None if v is None else [validator[0].from_python(x) for x in v]
+            else:
+                result[name] = validator.from_python(v)
+        return result
+
+    def incremental(self):
+        '''Returns an IncrementalSchema that only revalidates the fields whose input changed between calls'''
+        return IncrementalSchema(self)
+
+    def _instrumented(self):
+        '''The compiled validate_dict used while instrument is enabled, built on first use.
+
+        It records per field stats and runs each field through its validator's
+        instrumented to_python or _check instead of unrolling them.
+        '''
+        if self._instrumented_dict is None:
+            object.__setattr__(self, '_instrumented_dict', self._compile(instrument._record_field))
+        return self._instrumented_dict
+
+    def _compile(self, record=None, fields=None):
+        namespace = {'ValidationException': ValidationException, 'table': self.table,
+                     'record': record, 'timer': instrument._timer, 'is_blank': _is_blank}
+        lines = ['def validate_dict(data):',
+                 '    result = {}',
+                 '    errors = {}',
+                 '    get = data.get']
+
+        for i, (name, validator) in enumerate(self.fields.items() if fields is None else fields):
+            if record is not None:
+                lines.append('    start = timer()')
+                lines.append('    count = len(errors)')
+            lines.append('    value = get(%r)' % (name,))
+            if isinstance(validator, list):
+                if len(validator) != 1:
+                    raise ValueError('List fields must contain exactly one validator: %r' % (name,))
+                lines.append('    if value is None:')
+                lines.append('        result[%r] = None' % (name,))
+                lines.append('    elif not isinstance(value, (list, tuple)):')
+                self._emit_error(lines, '        ', name, repr(name), "ValidationException('Please enter a list - [%s]', message_args=(value,))")
+                lines.append('    else:')
+                lines.append('        items = result[%r] = [None] * len(value)' % (name,))
+                lines.append('        for index, value in enumerate(value):')
+                self._emit_field(lines, namespace, '            ', i, validator[0], 'items[index] = %s', '%r + \'.\' + str(index)' % (name,), 'str(index)', record)
+            else:
+                self._emit_field(lines, namespace, '    ', i, validator, 'result[%r] = %%s' % (name,), repr(name), repr(name), record)
+            if record is not None:
+                lines.append('    failed = len(errors) != count')
+                lines.append('    record(%r, timer() - start, failed, not failed and result[%r] is None)' % ('%s.%s' % (self.table or 'unknown', name), name))
+        lines.append('    return result, errors')
+
+        exec '\n'.join(lines) in namespace
+        return namespace['validate_dict']
+
+    @staticmethod
+    def _emit_error(lines, indent, field, path, exc):
+        lines.append('%se = %s' % (indent, exc))
+        lines.append('%se.field = %s' % (indent, field))
+        lines.append('%sif table is not None and e.table == \'unknown\':' % (indent,))
+        lines.append('%s    e.table = table' % (indent,))
+        lines.append('%serrors[%s] = e' % (indent, path))
+
+    def _emit_field(self, lines, namespace, indent, i, validator, store, path, field, record=None):
+        if isinstance(validator, Schema):
+            namespace['schema_%d' % i] = validator._validate_dict if record is None else validator._instrumented()
+            lines.append('%sif is_blank(value):' % (indent,))
+            lines.append('%s    %s' % (indent, store % 'None'))
+            lines.append('%selif not isinstance(value, dict):' % (indent,))
+            self._emit_error(lines, indent + '    ', field, path, "ValidationException('Please enter a dictionary - [%s]', message_args=(value,))")
+            lines.append('%selse:' % (indent,))
+            lines.append('%s    value, sub_errors = schema_%d(value)' % (indent, i))
+            lines.append('%s    %s' % (indent, store % 'value'))
+            lines.append('%s    for k, e in sub_errors.items():' % (indent,))
+            lines.append('%s        errors[%s + \'.\' + k] = e' % (indent, path))
+            return
+
+        if _native_check(validator):
+            # Rejected values come back as Invalid, no raising and unwinding per bad value
+            namespace['check_%d' % i] = validator._check
+            lines.append('%svalue, invalid = check_%d(value)' % (indent, i))
+            lines.append('%sif invalid is None:' % (indent,))
+            lines.append('%s    %s' % (indent, store % 'value'))
+            lines.append('%selse:' % (indent,))
+            self._emit_error(lines, indent + '    ', field, path, 'invalid.exception()')
+            return
+
+        if record is not None or not _inherits(validator, Validator, 'to_python'):
+            # Custom to_python, can't be unrolled into is_empty/_to_python/_validate (or instrumented)
+            namespace['to_python_%d' % i] = validator.to_python
+            expr = 'to_python_%d(value)' % i
+            lines.append('%stry:' % (indent,))
+        else:
+            if _inherits(validator, Validator, 'is_empty'):
+                lines.append('%sif is_blank(value):' % (indent,))
+            else:
+                namespace['is_empty_%d' % i] = validator.is_empty
+                lines.append('%sif is_empty_%d(value):' % (indent, i))
+            lines.append('%s    %s' % (indent, store % 'None'))
+            lines.append('%selse:' % (indent,))
+            indent += '    '
+
+            expr = 'value'
+            if not _inherits(validator, Validator, '_to_python'):
+                namespace['to_python_%d' % i] = validator._to_python
+                expr = 'to_python_%d(%s)' % (i, expr)
+            if not _inherits(validator, Validator, '_validate'):
+                namespace['validate_%d' % i] = validator._validate
+                expr = 'validate_%d(%s)' % (i, expr)
+            lines.append('%stry:' % (indent,))
+
+        lines.append('%s    %s' % (indent, store % expr))
+        lines.append('%sexcept ValidationException, e:' % (indent,))
+        lines.append('%s    e.field = %s' % (indent, field))
+        lines.append('%s    if table is not None and e.table == \'unknown\':' % (indent,))
+        lines.append('%s        e.table = table' % (indent,))
+        lines.append('%s    errors[%s] = e' % (indent, path))
+
+
+class IncrementalSchema(object):
+    """Validates successive versions of the same dict, rerunning only the fields that changed.
+
+    The raw input, result and errors of every field are remembered after each
+    call, a field is validated again only when its raw value differs (by type
+    and ==) from the previous call.  Meant for autosaving forms and PATCHes
+    where most of a large record stays the same, keep one per record and don't
+    share it between threads.  Unchanged ObjectIDs are not looked up again and
+    unchanged fields return the same ValidationException instances as before.
+
+    >>> from validation21 import Integer, Unicode
+    >>> inc = Schema({'id': Integer(min=1), 'name': Unicode(max_length=5), 'age': Integer()}, table='people').incremental()
+    >>> result, errors = inc.validate({'id': '3', 'name': 'bob', 'age': 'x'})
+    >>> sorted(result.items()), sorted(inc.revalidated)
+    ([('id', 3), ('name', u'bob')], ['age', 'id', 'name'])
+    >>> result, errors = inc.validate({'id': '3', 'name': 'bobby', 'age': 'x'})
+    >>> result['name'], inc.revalidated, [(e.table, e.field, str(e)) for e in errors.values()]
+    (u'bobby', ['name'], [('people', 'age', 'Please enter an integer - [x]')])
+    >>> result, errors = inc.patch({'age': '40'})
+    >>> sorted(result.items()), errors, inc.revalidated
+    ([('age', 40), ('id', 3), ('name', u'bobby')], {}, ['age'])
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        # Names of the fields validated by the last call
+        self.revalidated = []
+        self._functions = {}
+        self._raw = {}
+        self._fields = {}
+
+    def _field_functions(self):
+        # One compiled validate_dict per field, instrumented while instrument is enabled
+        record = instrument._record_field if instrument.active else None
+        functions = self._functions.get(record)
+        if functions is None:
+            functions = self._functions[record] = [
+                (name, self.schema._compile(record, [(name, validator)])) for name, validator in self.schema.fields.items()]
+        return functions
+
+    def validate(self, value):
+        """Returns (result, error_dict) like Schema.validate, reusing the results of unchanged fields."""
+        if not isinstance(value, dict):
+            return _not_a_dict(value, self.schema.table)
+
+        result = {}
+        errors = {}
+        raw = {}
+        revalidated = []
+        previous = self._fields
+        fields = {}
+        get = value.get
+        for name, validate_field in self._field_functions():
+            v = get(name)
+            state = previous.get(name)
+            if state is None or type(state[0]) is not type(v) or state[0] != v:
+                field_result, field_errors = validate_field({name: v})
+                state = (v if type(v) in _IMMUTABLE_TYPES else copy.deepcopy(v), field_result.get(name, _missing), field_errors)
+                revalidated.append(name)
+            fields[name] = state
+            raw[name] = state[0]
+            if state[1] is not _missing:
+                # Like Schema.validate, fields that failed are left out of the result
+                result[name] = state[1]
+            if state[2]:
+                errors.update(state[2])
+
+        self._fields = fields
+        self._raw = raw
+        self.revalidated = revalidated
+        return result, errors
+
+    def patch(self, changes):
+        """Validates the last input with changes applied on top, e.g. the body of a PATCH."""
+        value = dict(self._raw)
+        value.update(changes)
+        return self.validate(value)
+
+    def to_python(self, value):
+        if not isinstance(value, dict):
+            raise ValidationException('Please enter a dictionary - [%s]', message_args=(value,), table=self.schema.table)
+
+        result, errors = self.validate(value)
+        if errors:
+            raise ValidationException(error_dict=errors, table=self.schema.table)
+        return result
+
+    def reset(self):
+        '''Forgets the remembered fields, the next call validates everything'''
+        self.revalidated = []
+        self._raw = {}
+        self._fields = {}
+
+
+def _not_a_dict(value, table):
+    '''The (result, error_dict) validate returns for anything but a dict'''
+    e = ValidationException('Please enter a dictionary - [%s]', message_args=(value,), table=table)
+    return {}, {e.field: e}
+
+
+def _has_references(validator):
+    if isinstance(validator, list):
+        validator = validator[0]
+    if isinstance(validator, Schema):
+        return bool(validator._reference_fields)
+    return isinstance(validator, ObjectID) and validator.resolver is not None
+
+
+def _collect_reference(validator, value, pending):
+    if isinstance(validator, Schema):
+        validator._collect_references(value, pending)
+    elif _native_check(validator):
+        # Parse without the existence check, invalid values are reported by the validation pass
+        value, invalid = Integer._check(validator, value)
+        if value is not None:
+            pending.setdefault(validator, set()).add(value)
@@ -0,0 +1,40 @@
+import csv
+
+from schema import Schema
+
+__all__ = ['validate_csv']
+
+
+def validate_csv(fileobj, validators, table=None, **reader_kwargs):
+    """Lazily validates the rows of a CSV file with a header line.
+
+    validators maps column names to Validators (or a Schema).  Yields
+    (line_number, row, error_dict) for every data row, row only contains the
+    validated columns and error_dict maps column names to ValidationExceptions
+    (with field and table set).  Only one row is held in memory at a time.
+
+    >>> from StringIO import StringIO
+    >>> from validation21 import Integer, Date
+    >>> f = StringIO('id,born,note\\n1,12/2/1989,x\\nc,01/02/1989,y\\n')
+    >>> for line, row, errors in validate_csv(f, {'id': Integer(), 'born': Date()}, table='people'):
+    ...     print line, sorted(row.items()), [(e.table, e.field, str(e)) for e in errors.values()]
+    2 [('born', datetime.date(1989, 12, 2)), ('id', 1)] []
+    3 [('born', datetime.date(1989, 1, 2))] [('people', 'id', 'Please enter an integer - [c]')]
+    """
+    if isinstance(validators, Schema):
+        schema = validators
+    else:
+        schema = Schema(validators, table=table)
+    validate_dict = schema.validate
+
+    reader = csv.reader(fileobj, **reader_kwargs)
+    try:
+        header = next(reader)
+    except StopIteration:
+        return
+
+    for row in reader:
+        if not row:
+            continue
+        result, errors = validate_dict(dict(zip(header, row)))
+        yield reader.line_num, result, errors